@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Check the key backends that talk to the desktop against stand-ins.
+
+No compositor, Inkscape or X server is needed:
+
+  - hyprland: HyprlandBackend against a local AF_UNIX server that replays
+    Hyprland's replies (HYPRLAND_REPLIES) and records every request, so
+    the focuswindow/sendshortcut batches can be compared
+  - uinput: UInputBackend typing onto a recording device instead of
+    /dev/uinput, compared with the evdev events a US keyboard sends, and
+    KeyInjector leaving focus alone when there is no X window to raise
+  - dbus: InkscapeActionBackend against a stub org.gtk.Actions service on
+    a private dbus-daemon, so a running Inkscape is never touched; needs
+    PyGObject and dbus-daemon and is skipped without them
+  - shared: the SHARED_MODULES copies in floating_keypad/ and
+    numpad_palette/ are byte-identical
+
+Results are printed as JSON (or written with --output); the exit status is
+1 when any check failed.
+
+    python3 benchmarks/backend_check.py
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+
+from keypad_benchmark import TOOL_DIRS
+
+sys.path.insert(0, TOOL_DIRS['floating_keypad'])
+import keypad_backends
+
+# Each extension directory can be installed on its own, so these modules
+# ship in both. Edit the floating_keypad/ copy and copy it over.
+SHARED_MODULES = ('keypad_backends.py', 'keypad_instance.py', 'keypad_style.py',
+                  'keypad_window.py')
+
+# Replies as Hyprland sends them with two Inkscape documents and a browser
+# open, trimmed to the fields the backend reads
+HYPRLAND_CLIENTS = [
+    {'address': '0x5a1e2b40', 'class': 'org.inkscape.Inkscape',
+     'title': 'logo.svg - Inkscape', 'focusHistoryID': 2},
+    {'address': '0x5a1f0c10', 'class': 'firefox',
+     'title': 'Mozilla Firefox', 'focusHistoryID': 0},
+    {'address': '0x5a20d7e0', 'class': 'org.inkscape.Inkscape',
+     'title': 'poster.svg - Inkscape', 'focusHistoryID': 1},
+]
+HYPRLAND_REPLIES = {
+    'j/version': json.dumps({'branch': '', 'tag': 'v0.41.2'}),
+    'j/clients': json.dumps(HYPRLAND_CLIENTS),
+    'j/activewindow': json.dumps(HYPRLAND_CLIENTS[1]),
+}
+
+# Actions the stub Inkscape exports, by object path
+STUB_ACTIONS = {
+    '/org/inkscape/Inkscape': ['object-flip-horizontal', 'object-flip-vertical',
+                               'selection-group', 'selection-ungroup', 'selection-raise'],
+    '/org/inkscape/Inkscape/window/1': ['canvas-zoom-page'],
+}
+ACTIONS_XML = """
+<node>
+  <interface name='org.gtk.Actions'>
+    <method name='List'>
+      <arg type='as' direction='out'/>
+    </method>
+    <method name='Activate'>
+      <arg type='s' direction='in'/>
+      <arg type='av' direction='in'/>
+      <arg type='a{sv}' direction='in'/>
+    </method>
+  </interface>
+</node>
+"""
+
+
+# === STAND-INS ===
+class StandInHyprland:
+    """Answer Hyprland IPC requests from canned replies, one per connection"""
+
+    def __init__(self, replies):
+        self.replies = dict(replies)
+        self.requests = []
+        self.directory = tempfile.mkdtemp(prefix='keypad-hypr-')
+        self.path = os.path.join(self.directory, '.socket.sock')
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        self.server.listen(8)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                return
+            with connection:
+                request = connection.recv(65536).decode('utf-8')
+                self.requests.append(request)
+                if request.startswith('[[BATCH]]'):
+                    count = len(request[len('[[BATCH]]'):].split(';'))
+                    reply = 'ok' * count
+                else:
+                    reply = self.replies.get(request, 'unknown request')
+                connection.sendall(reply.encode('utf-8'))
+
+    def batches(self):
+        return [request[len('[[BATCH]]'):].split(';') for request in self.requests
+                if request.startswith('[[BATCH]]')]
+
+    def close(self):
+        self.server.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class RecordingDevice:
+    """Stands in for UInputDevice and records (type, code, value) events"""
+
+    def __init__(self):
+        self.events = []
+
+    def write(self, event_type, code, value):
+        self.events.append((event_type, code, value))
+
+    def syn(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class StubInkscapeActions:
+    """Export org.gtk.Actions as Inkscape does, on a private dbus-daemon.
+
+    Records ('List', path) and ('Activate', path, name) for every call.
+    client is a connection to the same bus for InkscapeActionBackend.
+    """
+
+    def __init__(self, actions):
+        from gi.repository import Gio, GLib
+        self.Gio = Gio
+        self.GLib = GLib
+        self.actions = actions
+        self.calls = []
+        self.daemon = subprocess.Popen(['dbus-daemon', '--session', '--nofork',
+                                        '--print-address=1'],
+                                       stdout=subprocess.PIPE, text=True)
+        address = self.daemon.stdout.readline().strip()
+        flags = (Gio.DBusConnectionFlags.AUTHENTICATION_CLIENT |
+                 Gio.DBusConnectionFlags.MESSAGE_BUS_CONNECTION)
+        self.service = Gio.DBusConnection.new_for_address_sync(address, flags, None, None)
+        self.client = Gio.DBusConnection.new_for_address_sync(address, flags, None, None)
+        interface = Gio.DBusNodeInfo.new_for_xml(ACTIONS_XML).interfaces[0]
+        self.registrations = [self.service.register_object(path, interface, self.handle,
+                                                           None, None)
+                              for path in actions]
+        self.bus(self.service, 'RequestName',
+                 GLib.Variant('(su)', (keypad_backends.InkscapeActionBackend.BUS_NAME, 0)))
+        # Method calls are dispatched on the default main context
+        self.loop = GLib.MainLoop()
+        self.thread = threading.Thread(target=self.loop.run, daemon=True)
+        self.thread.start()
+
+    def bus(self, connection, method, parameters):
+        return connection.call_sync('org.freedesktop.DBus', '/org/freedesktop/DBus',
+                                    'org.freedesktop.DBus', method, parameters, None,
+                                    self.Gio.DBusCallFlags.NONE, -1, None)
+
+    def handle(self, connection, sender, path, interface, method, parameters, invocation):
+        if method == 'List':
+            self.calls.append(('List', path))
+            invocation.return_value(self.GLib.Variant('(as)', (self.actions[path],)))
+        else:
+            self.calls.append(('Activate', path, parameters.unpack()[0]))
+            invocation.return_value(None)
+
+    def quit_inkscape(self):
+        """Drop the bus name and objects, as when Inkscape is closed"""
+        for registration in self.registrations:
+            self.service.unregister_object(registration)
+        self.registrations = []
+        self.bus(self.service, 'ReleaseName',
+                 self.GLib.Variant('(s)', (keypad_backends.InkscapeActionBackend.BUS_NAME,)))
+
+    def close(self):
+        self.loop.quit()
+        self.client.close_sync(None)
+        self.service.close_sync(None)
+        self.daemon.terminate()
+        self.daemon.wait()
+
+
+class RecordingBackend:
+    """A last-resort backend that accepts every key and records the steps"""
+
+    name = 'recording'
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, steps):
+        self.sent.append(list(steps))
+
+    def close(self):
+        pass
+
+
+def uinput_backend(device):
+    """A UInputBackend class that types onto device instead of /dev/uinput"""
+    class RecordingUInputBackend(keypad_backends.UInputBackend):
+        def __init__(self):
+            super().__init__(device)
+    return RecordingUInputBackend
+
+
+def hyprland_backend(socket_path):
+    """A HyprlandBackend class that talks to socket_path"""
+    class StandInHyprlandBackend(keypad_backends.HyprlandBackend):
+        def __init__(self):
+            super().__init__(socket_path)
+    return StandInHyprlandBackend
+
+
+@contextlib.contextmanager
+def backend_tiers(*tiers):
+    """Make KeyInjector use these tiers, as default_backend_tiers would"""
+    default_backend_tiers = keypad_backends.default_backend_tiers
+    keypad_backends.default_backend_tiers = lambda: list(tiers)
+    try:
+        yield
+    finally:
+        keypad_backends.default_backend_tiers = default_backend_tiers
+
+
+# === CHECKS ===
+def check_hyprland():
+    results = []
+
+    def run(name, presses, expected, settings=None):
+        """Send each (replies, steps) press with the stand-in answering replies"""
+        standin = StandInHyprland(HYPRLAND_REPLIES)
+        device = RecordingDevice()
+        errors = []
+        try:
+            # Hyprland ranks above uinput, as under a real Hyprland session
+            with backend_tiers((hyprland_backend(standin.path),), (uinput_backend(device),)):
+                injector = keypad_backends.KeyInjector(
+                    dict(keypad_backends.DEFAULT_SETTINGS, **(settings or {})))
+            for replies, steps in presses:
+                standin.replies = dict(HYPRLAND_REPLIES, **replies)
+                try:
+                    injector.send(steps)
+                except Exception as e:
+                    errors.append(str(e))
+            injector.close()
+        finally:
+            standin.close()
+        got = {'batches': standin.batches(), 'uinput_events': len(device.events),
+               'errors': errors}
+        results.append({'check': f"hyprland: {name}", 'ok': got == expected,
+                        'expected': expected, 'got': got})
+
+    logo, browser, poster = (client['address'] for client in HYPRLAND_CLIENTS)
+    logo_active = {'j/activewindow': json.dumps(HYPRLAND_CLIENTS[0])}
+    poster_active = {'j/activewindow': json.dumps(HYPRLAND_CLIENTS[2])}
+    run("browser active, last focused Inkscape document gets the keys",
+        [({}, 'ctrl+shift+g')],
+        {'batches': [[f"dispatch focuswindow address:{poster}",
+                      f"dispatch sendshortcut CTRL SHIFT,g,address:{poster}"]],
+         'uinput_events': 0, 'errors': []})
+    run("macro with a delay is split into two batches",
+        [(logo_active, ['ctrl+d', {'key': 'h', 'delay': 0.01}])],
+        {'batches': [[f"dispatch focuswindow address:{logo}",
+                      f"dispatch sendshortcut CTRL,d,address:{logo}"],
+                     [f"dispatch sendshortcut ,h,address:{logo}"]],
+         'uinput_events': 0, 'errors': []})
+    run("each press follows the document the user switched to",
+        [(logo_active, 'Delete'), (poster_active, 'Delete')],
+        {'batches': [[f"dispatch focuswindow address:{logo}",
+                      f"dispatch sendshortcut ,Delete,address:{logo}"],
+                     [f"dispatch focuswindow address:{poster}",
+                      f"dispatch sendshortcut ,Delete,address:{poster}"]],
+         'uinput_events': 0, 'errors': []})
+    run("direct mode sends without focuswindow",
+        [({}, 'Delete')],
+        {'batches': [[f"dispatch sendshortcut ,Delete,address:{poster}"]],
+         'uinput_events': 0, 'errors': []},
+        {'focus_mode': 'direct'})
+    run("macro with a bad step after a delay sends no batch",
+        [(logo_active, ['Delete', {'key': 'hyper+x', 'delay': 0.01}])],
+        {'batches': [], 'uinput_events': 0,
+         'errors': ["No key injection backend available"]})
+    run("no Inkscape window aborts the press instead of typing with uinput",
+        [({'j/clients': json.dumps([HYPRLAND_CLIENTS[1]])}, 'Delete')],
+        {'batches': [], 'uinput_events': 0, 'errors': ["no Inkscape window"]})
+    return results
+
+
+def check_uinput():
+    results = []
+    codes = keypad_backends.UINPUT_KEYCODES
+    ctrl, shift = codes['Control_L'], codes['Shift_L']
+
+    def events(*codes):
+        """Press codes in order, release them in reverse"""
+        return ([(keypad_backends.EV_KEY, code, 1) for code in codes] +
+                [(keypad_backends.EV_KEY, code, 0) for code in reversed(codes)])
+
+    def run(name, steps, expected_events, expected_fallback=()):
+        device = RecordingDevice()
+        with backend_tiers((uinput_backend(device),), (RecordingBackend,)):
+            injector = keypad_backends.KeyInjector(None)
+        # Native Wayland Inkscape: no X window id to raise
+        activated = injector.activate_window(None)
+        backend = injector.send(steps)
+        fallback = [backend for backend in injector.backends
+                    if isinstance(backend, RecordingBackend)]
+        injector.close()
+        expected = {'activated': False, 'events': expected_events,
+                    'fallback': list(expected_fallback)}
+        got = {'activated': activated, 'events': device.events,
+               'fallback': fallback[0].sent if fallback else []}
+        results.append({'check': f"uinput: {name}", 'ok': got == expected,
+                        'expected': expected, 'got': got})
+
+    run("ctrl+shift+g", 'ctrl+shift+g', events(ctrl, shift, codes['g']))
+    run("shifted symbol", 'plus', events(shift, codes['equal']))
+    run("capital letter", 'A', events(shift, codes['a']))
+    run("macro sent twice", ['Delete', 'KP_1'] * 2,
+        (events(codes['Delete']) + events(codes['KP_1'])) * 2)
+    run("unknown key is passed on", 'XF86Calculator', [],
+        [[('XF86Calculator', 0.0)]])
+    run("macro with an unknown step types nothing, then is passed on whole",
+        ['Delete', 'XF86Calculator'], [],
+        [[('Delete', 0.0), ('XF86Calculator', 0.0)]])
+    return results
+
+
+def check_dbus():
+    if not shutil.which('dbus-daemon'):
+        return [{'check': "dbus", 'skipped': "dbus-daemon is not installed"}]
+    try:
+        import gi  # noqa: F401
+    except ImportError:
+        return [{'check': "dbus", 'skipped': "PyGObject is not installed"}]
+
+    results = []
+    app, win = STUB_ACTIONS
+    stub = StubInkscapeActions(STUB_ACTIONS)
+    # No key backends: only actions are run
+    injector = keypad_backends.KeyInjector(None, ())
+    injector.actions = keypad_backends.InkscapeActionBackend(stub.client)
+
+    def run(name, action, count, expected_calls, expected_error=None, settings=None):
+        injector.configure(dict(keypad_backends.DEFAULT_SETTINGS, **(settings or {})))
+        stub.calls.clear()
+        try:
+            injector.send_action(action, count)
+            error = None
+        except Exception as e:
+            # ValueError makes the keypads type the button's keys instead
+            error = type(e).__name__
+        expected = {'calls': expected_calls, 'error': expected_error}
+        got = {'calls': list(stub.calls), 'error': error}
+        results.append({'check': f"dbus: {name}", 'ok': got == expected,
+                        'expected': expected, 'got': got})
+
+    try:
+        run("app action lists actions once, then activates", 'app.object-flip-horizontal', 1,
+            [('List', app), ('Activate', app, 'object-flip-horizontal')])
+        run("count activates the action that many times", 'app.selection-raise', 3,
+            [('Activate', app, 'selection-raise')] * 3)
+        run("win action goes to the first window", 'win.canvas-zoom-page', 1,
+            [('List', win), ('Activate', win, 'canvas-zoom-page')])
+        run("unknown action falls back to keys", 'app.no-such-action', 1,
+            [], 'ValueError')
+        run("inkscape_actions off falls back to keys", 'app.selection-group', 1,
+            [], 'ValueError', {'inkscape_actions': False})
+        stub.quit_inkscape()
+        run("Inkscape closed falls back to keys", 'app.selection-group', 1,
+            [], 'ValueError')
+    finally:
+        injector.close()
+        stub.close()
+    return results
+
+
+def check_shared():
+    results = []
+    for module in SHARED_MODULES:
+        copies = []
+        for tool in sorted(TOOL_DIRS):
+            with open(os.path.join(TOOL_DIRS[tool], module), 'rb') as f:
+                copies.append(f.read().splitlines())
+        first, second = copies
+        differs = [number for number, (a, b) in enumerate(zip(first, second), 1) if a != b]
+        if not differs and len(first) != len(second):
+            differs = [min(len(first), len(second)) + 1]
+        results.append({'check': f"shared: {module}", 'ok': not differs,
+                        'first_difference_line': differs[0] if differs else None})
+    return results
+
+
+CHECKS = {
+    'hyprland': check_hyprland,
+    'uinput': check_uinput,
+    'dbus': check_dbus,
+    'shared': check_shared,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--checks', nargs='+', choices=list(CHECKS), default=list(CHECKS))
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    # The backends print as they go; keep stdout for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        for name in args.checks:
+            results.extend(CHECKS[name]())
+    for result in results:
+        status = result.get('skipped') or ('ok' if result['ok'] else 'FAILED')
+        print(f"{result['check']}: {status}", file=sys.stderr)
+
+    text = json.dumps({'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0 if all(result.get('ok', True) for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
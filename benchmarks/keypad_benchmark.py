@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Headless end-to-end key delivery benchmark for both keypads.
+
+Starts Xvfb with a stand-in "Inkscape" window (WM_CLASS org.inkscape.Inkscape)
+that records every key it receives, then clicks FloatingKeyboard and
+NumpadPalette buttons in-process and measures, per injection path:
+
+  - correctness: the delivered key combinations match the clicked buttons
+  - latency: click to KeyPress at the stand-in, one press at a time
+  - throughput: presses per second for a burst of clicks
+
+Xvfb runs no window manager, so the stand-in also provides the EWMH bits
+the keypads use: _NET_CLIENT_LIST, _NET_ACTIVE_WINDOW and the activation
+request sent by `wmctrl -i -a`.
+
+Results are printed as JSON (or written with --output); the exit status is
+1 when any path delivered a wrong or missing key.
+
+    python3 benchmarks/keypad_benchmark.py --presses 200 --output bench.json
+
+Needs Xvfb, PyQt5 and python-xlib; xdotool, wmctrl and pyautogui are
+needed only for the paths that use them, and missing ones are reported
+as skipped.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import select
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOL_DIRS = {
+    'floating_keypad': os.path.join(ROOT, 'floating_keypad'),
+    'numpad_palette': os.path.join(ROOT, 'numpad_palette'),
+}
+
+# Injection paths: KeyInjector backends by class name, and the focus mode.
+# 'auto' lets the injector probe and pick as the keypads do. Xvfb reads
+# no input devices, so uinput is only measured on a real --display.
+PATHS = {
+    'auto': {'backends': None, 'focus_mode': 'activate'},
+    'xtest': {'backends': ('XTestBackend',), 'focus_mode': 'activate'},
+    'xsendevent': {'backends': ('XTestBackend',), 'focus_mode': 'direct'},
+    'xdotool': {'backends': ('XdotoolBackend',), 'focus_mode': 'activate'},
+    'xdotool-direct': {'backends': ('XdotoolBackend',), 'focus_mode': 'direct'},
+    'pyautogui': {'backends': ('PyAutoGUIBackend',), 'focus_mode': 'activate'},
+    'uinput': {'backends': ('UInputBackend',), 'focus_mode': 'activate', 'xvfb': False},
+}
+
+# Floating keypad buttons by label, with the key each one sends
+FLOATING_BUTTONS = {
+    '↑': 'Up',
+    '↓': 'Down',
+    '←': 'Left',
+    '→': 'Right',
+    'Copy': 'ctrl+c',
+    'Ungrp': 'ctrl+shift+g',
+    'Raise': 'Page_Up',
+    'TAB': 'Tab',
+    'FlipH': 'h',
+}
+
+MODIFIER_NAMES = {'ctrl': 'ctrl', 'control': 'ctrl', 'shift': 'shift',
+                  'alt': 'alt', 'meta': 'alt', 'super': 'super'}
+
+
+# === X SERVER ===
+def start_xvfb(size='1280x800x24'):
+    """Start Xvfb on a free display number; return (process, display name)"""
+    for number in range(90, 200):
+        if (os.path.exists(f"/tmp/.X11-unix/X{number}") or
+                os.path.exists(f"/tmp/.X{number}-lock")):
+            continue
+        process = subprocess.Popen(['Xvfb', f":{number}", '-screen', '0', size,
+                                    '-nolisten', 'tcp'],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if os.path.exists(f"/tmp/.X11-unix/X{number}"):
+                return process, f":{number}"
+            if process.poll() is not None:
+                break
+            time.sleep(0.02)
+        process.kill()
+    raise RuntimeError("Could not start Xvfb")
+
+
+class StandInInkscape:
+    """A window with Inkscape's WM_CLASS that records the keys it receives.
+
+    All X calls after __init__ happen on the recorder thread, since an Xlib
+    connection is not thread-safe; other threads only read the recorded
+    events and ask for focus through request_focus().
+    """
+
+    def __init__(self):
+        from Xlib import X, XK, Xatom, display
+        self.X = X
+        self.XK = XK
+        self.display = display.Display()
+        screen = self.display.screen()
+        self.root = screen.root
+        self.window = self.root.create_window(
+            0, 0, 800, 600, 0, screen.root_depth,
+            event_mask=X.KeyPressMask | X.StructureNotifyMask)
+        self.window.set_wm_class('org.inkscape.Inkscape', 'Inkscape')
+        self.window.set_wm_name('Inkscape stand-in')
+        self.window.map()
+
+        self.active_atom = self.display.intern_atom('_NET_ACTIVE_WINDOW')
+        self.root.change_property(self.display.intern_atom('_NET_CLIENT_LIST'),
+                                  Xatom.WINDOW, 32, [self.window.id])
+        self.root.change_property(self.active_atom, Xatom.WINDOW, 32, [self.window.id])
+        # wmctrl sends its activation request to the root window with
+        # SubstructureNotify|Redirect; notify is enough to see it without
+        # becoming the window manager
+        self.root.change_attributes(event_mask=X.SubstructureNotifyMask)
+        self.window.set_input_focus(X.RevertToParent, X.CurrentTime)
+        self.display.sync()
+
+        self.events = []
+        self.condition = threading.Condition()
+        self.focus_requested = threading.Event()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name='stand-in', daemon=True)
+        self.thread.start()
+
+    @property
+    def window_id(self):
+        return self.window.id
+
+    def request_focus(self):
+        self.focus_requested.set()
+        while self.focus_requested.is_set():
+            time.sleep(0.001)
+
+    def reset(self):
+        with self.condition:
+            self.events = []
+
+    def received(self):
+        with self.condition:
+            return list(self.events)
+
+    def run(self):
+        fd = self.display.fileno()
+        while self.running:
+            if self.focus_requested.is_set():
+                self.focus()
+                self.focus_requested.clear()
+            if not self.display.pending_events():
+                select.select([fd], [], [], 0.01)
+            while self.display.pending_events():
+                self.handle(self.display.next_event())
+
+    def focus(self):
+        self.window.set_input_focus(self.X.RevertToParent, self.X.CurrentTime)
+        self.display.sync()
+
+    def handle(self, event):
+        if event.type == self.X.KeyPress:
+            received_at = time.perf_counter()
+            combination = self.combination(event)
+            if combination is not None:
+                with self.condition:
+                    self.events.append((received_at, combination))
+                    self.condition.notify_all()
+        elif event.type == self.X.ClientMessage:
+            if event.client_type == self.active_atom and event.window.id == self.window.id:
+                self.focus()
+
+    def combination(self, event):
+        """Return (modifiers, keysym) for a non-modifier KeyPress, else None"""
+        keysym = self.display.keycode_to_keysym(event.detail, 0)
+        name = self.XK.keysym_to_string(keysym) or ''
+        if name.split('_')[0] in ('Control', 'Shift', 'Alt', 'Super', 'Meta'):
+            return None
+        modifiers = set()
+        if event.state & self.X.ControlMask:
+            modifiers.add('ctrl')
+        if event.state & self.X.ShiftMask:
+            modifiers.add('shift')
+        if event.state & self.X.Mod1Mask:
+            modifiers.add('alt')
+        if event.state & self.X.Mod4Mask:
+            modifiers.add('super')
+        return (frozenset(modifiers), keysym)
+
+    def expected(self, key_combination):
+        """Return what the recorder reports for a key string like 'ctrl+d'"""
+        *modifiers, key = key_combination.split('+')
+        keysym = self.XK.string_to_keysym(key)
+        if keysym == 0:
+            keysym = self.XK.string_to_keysym(key.lower())
+        # The recorder reads the unshifted keysym of the keycode
+        keycode = self.display.keysym_to_keycode(keysym)
+        if keycode:
+            keysym = self.display.keycode_to_keysym(keycode, 0)
+        return (frozenset(MODIFIER_NAMES[m.lower()] for m in modifiers), keysym)
+
+    def close(self):
+        self.running = False
+        self.thread.join(timeout=1)
+        self.display.close()
+
+
+# === KEYPADS ===
+def wait_for(app, condition, timeout):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        app.processEvents()
+        time.sleep(0.0005)
+    return True
+
+
+def start_keypad(app, tool):
+    sys.path.insert(0, TOOL_DIRS[tool])
+    if tool == 'floating_keypad':
+        from floating_keypad import FloatingKeyboard
+        keypad = FloatingKeyboard()
+    else:
+        from numpad_palette import NumpadPalette
+        keypad = NumpadPalette()
+    keypad.show()
+    if not wait_for(app, lambda: keypad.inkscape_window_id, 5):
+        raise RuntimeError(f"{tool} did not find the stand-in window")
+    return keypad
+
+
+def stop_keypad(keypad):
+    # close_application() ends the process, so release its parts by hand
+    keypad.dispatcher.stop()
+    keypad.injector.close()
+    if keypad.window_tracker:
+        keypad.window_tracker.close()
+    if keypad.instance_server:
+        keypad.instance_server.close()
+    if hasattr(keypad, 'tray_icon'):
+        keypad.tray_icon.hide()
+    keypad.hide()
+    keypad.deleteLater()
+
+
+def keypad_presses(keypad, tool):
+    """Return [(button, key_combination), ...] to cycle through"""
+    from PyQt5.QtWidgets import QPushButton
+    if tool == 'floating_keypad':
+        buttons = {button.text(): button for button in keypad.findChildren(QPushButton)}
+        return [(buttons[label], key) for label, key in FLOATING_BUTTONS.items()]
+    keypad.set_layer('NUM')
+    # The ×N key turns on count mode and sends nothing itself
+    return [(button, keypad.get_button_key(key_id, 'NUM'))
+            for key_id, button in keypad.layer_buttons['NUM'].items()
+            if not keypad.get_button_count(key_id, 'NUM')]
+
+
+def configure_path(keypad, path, queue_depth, on_xvfb):
+    """Point the keypad at one injection path; return a reason to skip or None"""
+    import keypad_backends
+    spec = PATHS[path]
+    if on_xvfb and not spec.get('xvfb', True):
+        return "not visible to Xvfb"
+    # Buttons with an Inkscape action would run it over D-Bus on the user's
+    # real document instead of typing into the stand-in
+    settings = dict(keypad.settings, focus_mode=spec['focus_mode'], queue_depth=queue_depth,
+                    inkscape_actions=False)
+    classes = None
+    if spec['backends'] is not None:
+        for name in spec['backends']:
+            if not hasattr(keypad_backends, name):
+                return f"no backend {name}"
+        classes = tuple(getattr(keypad_backends, name) for name in spec['backends'])
+
+    keypad.injector.close()
+    keypad.injector = keypad_backends.KeyInjector(settings, classes)
+    if not keypad.injector.backends:
+        return "backend unavailable"
+    keypad.dispatcher.configure(settings)
+    keypad.latency = keypad_backends.LatencyStats(settings)
+    return None
+
+
+# === MEASUREMENT ===
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+    pick = lambda fraction: values[min(len(values) - 1, int(fraction * len(values)))]
+    return {'p50': round(pick(0.5) * 1000, 3), 'p99': round(pick(0.99) * 1000, 3),
+            'mean': round(sum(values) / len(values) * 1000, 3)}
+
+
+def measure(app, standin, keypad, presses, count, timeout):
+    expected = [standin.expected(key) for _, key in presses]
+
+    # Latency: one press at a time, click to KeyPress
+    standin.reset()
+    latencies = []
+    for i in range(count):
+        button, _ = presses[i % len(presses)]
+        clicked_at = time.perf_counter()
+        button.click()
+        if not wait_for(app, lambda: len(standin.received()) > i, timeout):
+            break
+        latencies.append(standin.received()[i][0] - clicked_at)
+    received = [combination for _, combination in standin.received()]
+    wanted = [expected[i % len(expected)] for i in range(count)]
+    sequential_correct = sum(a == b for a, b in zip(wanted, received))
+    sequential_exact = received == wanted
+
+    # Throughput: all clicks at once, then wait for the queue to drain
+    standin.reset()
+    started_at = time.perf_counter()
+    for i in range(count):
+        presses[i % len(presses)][0].click()
+    # Stop once everything arrived or nothing new came for `timeout` seconds
+    seen = 0
+    while seen < count and wait_for(app, lambda: len(standin.received()) > seen, timeout):
+        seen = len(standin.received())
+    burst = standin.received()
+    received = [combination for _, combination in burst]
+    elapsed = (burst[-1][0] - started_at) if burst else None
+    burst_correct = sum(a == b for a, b in zip(wanted, received))
+
+    phases = {}
+    for phase in ('total', 'lookup', 'queue', 'activate', 'settle', 'inject'):
+        result = keypad.latency.percentiles(phase)
+        if result:
+            phases[phase] = {'p50': round(result[0] * 1000, 3),
+                             'p99': round(result[1] * 1000, 3)}
+    return {
+        'presses': count,
+        'delivered': len(latencies),
+        'correct': sequential_correct,
+        'latency_ms': percentiles(latencies),
+        'burst_delivered': len(burst),
+        'burst_correct': burst_correct,
+        'presses_per_second': round(len(burst) / elapsed, 1) if elapsed else None,
+        'phases_ms': phases,
+        'ok': sequential_exact and received == wanted,
+    }
+
+
+def tool_versions():
+    versions = {'python': platform.python_version()}
+    for tool in ('Xvfb', 'xdotool', 'wmctrl'):
+        versions[tool] = bool(shutil.which(tool))
+    try:
+        from PyQt5.QtCore import QT_VERSION_STR
+        versions['qt'] = QT_VERSION_STR
+    except ImportError:
+        pass
+    return versions
+
+
+def run(args):
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([sys.argv[0]])
+    app.setQuitOnLastWindowClosed(False)
+    standin = StandInInkscape()
+    results = []
+    try:
+        for tool in args.tools:
+            keypad = start_keypad(app, tool)
+            presses = keypad_presses(keypad, tool)
+            for path in args.paths:
+                result = {'tool': tool, 'path': path}
+                skip = configure_path(keypad, path, args.presses, not args.display)
+                if skip:
+                    result['skipped'] = skip
+                else:
+                    # The keypad window may have taken focus when shown
+                    standin.request_focus()
+                    result.update(measure(app, standin, keypad, presses,
+                                          args.presses, args.timeout))
+                print(f"{tool} / {path}: {result.get('skipped') or result['ok']}",
+                      file=sys.stderr)
+                results.append(result)
+            stop_keypad(keypad)
+            app.processEvents()
+    finally:
+        standin.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--tools', nargs='+', choices=sorted(TOOL_DIRS),
+                        default=sorted(TOOL_DIRS))
+    parser.add_argument('--paths', nargs='+', choices=list(PATHS), default=list(PATHS))
+    parser.add_argument('--presses', type=int, default=100,
+                        help="presses per measurement (default 100)")
+    parser.add_argument('--timeout', type=float, default=2.0,
+                        help="seconds to wait for one press to arrive")
+    parser.add_argument('--display', help="use this X display instead of starting Xvfb")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    xvfb = None
+    if args.display:
+        os.environ['DISPLAY'] = args.display
+    else:
+        xvfb, os.environ['DISPLAY'] = start_xvfb()
+    # Keep instance sockets and caches away from a running keypad
+    scratch = tempfile.mkdtemp(prefix='keypad-bench-')
+    os.environ['XDG_RUNTIME_DIR'] = scratch
+    os.environ['XDG_CACHE_HOME'] = scratch
+    os.environ.setdefault('QT_QPA_PLATFORM', 'xcb')
+
+    try:
+        # The keypads print every press; keep stdout for the report
+        with contextlib.redirect_stdout(sys.stderr):
+            results = run(args)
+    finally:
+        if xvfb:
+            xvfb.terminate()
+            xvfb.wait()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    report = {
+        'timestamp': time.time(),
+        'display': os.environ['DISPLAY'],
+        'environment': tool_versions(),
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0 if all(r.get('ok', True) for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
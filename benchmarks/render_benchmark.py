@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Rendering cost of the keypads while idle and while dragged.
+
+Shows FloatingKeyboard and NumpadPalette in each render_mode, leaves them
+idle, then drags them by the title with synthetic mouse moves at stylus
+rate, and reports per mode:
+
+  - cpu_percent: keypad process CPU time over wall time
+  - server_cpu_percent: the same for the X server, which does the
+    compositing and drawing on Xvfb (only when this script started it)
+  - gpu_busy_percent: mean of /sys/class/drm/*/device/gpu_busy_percent
+    samples, on drivers that expose it; null otherwise
+  - paints, and for drags the pointer events and window moves applied
+
+Results are printed as JSON (or written with --output).
+
+    python3 benchmarks/render_benchmark.py --seconds 3 --rate 240
+    python3 benchmarks/render_benchmark.py --display :0   # real GPU
+
+Needs PyQt5 and Xvfb (or --display).
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from keypad_benchmark import TOOL_DIRS, start_xvfb, tool_versions, wait_for
+
+RENDER_MODES = ('translucent', 'opaque', 'cached')
+
+# Settings forced onto every keypad the benchmark starts
+FORCED_SETTINGS = {}
+
+
+# === COST SAMPLING ===
+def process_cpu(pid=None):
+    """Return user+system CPU seconds of a process (this one by default)"""
+    if pid is None:
+        times = os.times()
+        return times.user + times.system
+    try:
+        with open(f"/proc/{pid}/stat", 'r') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def gpu_busy_files():
+    return glob.glob('/sys/class/drm/card*/device/gpu_busy_percent')
+
+
+def read_gpu_busy(files):
+    values = []
+    for path in files:
+        try:
+            with open(path, 'r') as f:
+                values.append(int(f.read().strip()))
+        except (OSError, ValueError):
+            pass
+    return max(values) if values else None
+
+
+class PaintCounter:
+    """Count paint events of a window and all of its children"""
+
+    def __init__(self, window):
+        from PyQt5.QtCore import QObject, QEvent
+        from PyQt5.QtWidgets import QWidget
+
+        class Filter(QObject):
+            def eventFilter(filter_self, watched, event):
+                if event.type() == QEvent.Paint:
+                    self.paints += 1
+                return False
+
+        self.paints = 0
+        self.filter = Filter()
+        self.widgets = [window] + window.findChildren(QWidget)
+        for widget in self.widgets:
+            widget.installEventFilter(self.filter)
+
+    def close(self):
+        for widget in self.widgets:
+            widget.removeEventFilter(self.filter)
+
+
+def run_for(app, seconds, step=None, interval=0.002):
+    """Run the event loop for seconds, calling step(elapsed) as often as it allows"""
+    started = time.perf_counter()
+    while True:
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            return
+        if step:
+            step(elapsed)
+        app.processEvents()
+        time.sleep(interval)
+
+
+def measure(app, keypad, seconds, server_pid, gpu_files, step=None, interval=0.002):
+    counter = PaintCounter(keypad)
+    gpu_samples = []
+    cpu_before = process_cpu()
+    server_before = process_cpu(server_pid) if server_pid else None
+    started = time.perf_counter()
+
+    def sample(elapsed):
+        if step:
+            step(elapsed)
+        busy = read_gpu_busy(gpu_files)
+        if busy is not None:
+            gpu_samples.append(busy)
+
+    run_for(app, seconds, sample, interval)
+    wall = time.perf_counter() - started
+    cpu = process_cpu() - cpu_before
+    counter.close()
+    result = {
+        'seconds': round(wall, 3),
+        'cpu_percent': round(cpu / wall * 100, 1),
+        'paints': counter.paints,
+        'gpu_busy_percent': (round(sum(gpu_samples) / len(gpu_samples), 1)
+                             if gpu_samples else None),
+    }
+    if server_before is not None:
+        server_after = process_cpu(server_pid)
+        if server_after is not None:
+            result['server_cpu_percent'] = round((server_after - server_before) / wall * 100, 1)
+    return result
+
+
+# === KEYPADS ===
+def force_settings():
+    """Make every keypad started from here use FORCED_SETTINGS"""
+    import keypad_backends
+    merge_settings = keypad_backends.merge_settings
+    keypad_backends.merge_settings = lambda overrides: dict(merge_settings(overrides),
+                                                            **FORCED_SETTINGS)
+
+
+def start_keypad(app, tool, render_mode):
+    FORCED_SETTINGS['render_mode'] = render_mode
+    if tool == 'floating_keypad':
+        from floating_keypad import FloatingKeyboard
+        keypad = FloatingKeyboard()
+    else:
+        from numpad_palette import NumpadPalette
+        keypad = NumpadPalette()
+    keypad.move(100, 100)
+    keypad.show()
+    wait_for(app, lambda: keypad.first_paint_done, 5)
+    return keypad
+
+
+def stop_keypad(app, keypad):
+    # close_application() ends the process, so release its parts by hand
+    keypad.dispatcher.stop()
+    keypad.injector.close()
+    if keypad.window_tracker:
+        keypad.window_tracker.close()
+    if keypad.instance_server:
+        keypad.instance_server.close()
+    if hasattr(keypad, 'tray_icon'):
+        keypad.tray_icon.hide()
+    keypad.hide()
+    keypad.deleteLater()
+    app.processEvents()
+
+
+def drag(app, keypad, seconds, rate, server_pid, gpu_files):
+    """Drag the keypad by its title in a circle with rate pointer events per second"""
+    import math
+    from PyQt5.QtCore import QEvent, QPoint, Qt
+    from PyQt5.QtGui import QMouseEvent
+
+    def send(kind, global_pos, button, buttons):
+        event = QMouseEvent(kind, keypad.mapFromGlobal(global_pos), global_pos,
+                            button, buttons, Qt.NoModifier)
+        app.sendEvent(keypad, event)
+
+    origin = keypad.mapToGlobal(QPoint(keypad.width() // 2, 15))
+    send(QEvent.MouseButtonPress, origin, Qt.LeftButton, Qt.LeftButton)
+    mover = keypad.drag_mover
+    events_before, moves_before = mover.events, mover.moves
+    sent = [0]
+
+    def step(elapsed):
+        # Catch up to the pointer events a stylus would have sent by now
+        while sent[0] < int(elapsed * rate):
+            sent[0] += 1
+            angle = sent[0] / rate * math.pi
+            offset = QPoint(int(100 * math.cos(angle)) - 100, int(100 * math.sin(angle)))
+            send(QEvent.MouseMove, origin + offset, Qt.NoButton, Qt.LeftButton)
+
+    result = measure(app, keypad, seconds, server_pid, gpu_files, step, interval=0.0005)
+    send(QEvent.MouseButtonRelease, origin, Qt.LeftButton, Qt.NoButton)
+    result['pointer_events'] = mover.events - events_before
+    result['window_moves'] = mover.moves - moves_before
+    result['moves_per_second'] = round(result['window_moves'] / result['seconds'], 1)
+    return result
+
+
+def run(args, server_pid):
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([sys.argv[0]])
+    app.setQuitOnLastWindowClosed(False)
+    screen = app.primaryScreen()
+    gpu_files = gpu_busy_files()
+    for tool in args.tools:
+        sys.path.insert(0, TOOL_DIRS[tool])
+    force_settings()
+    results = []
+    for tool in args.tools:
+        for render_mode in args.modes:
+            keypad = start_keypad(app, tool, render_mode)
+            # Let startup work (window search, config watcher) settle first
+            run_for(app, 0.5)
+            result = {
+                'tool': tool,
+                'render_mode': render_mode,
+                'refresh_rate': screen.refreshRate() if screen else None,
+                'frame_interval_ms': keypad.drag_mover.frame_interval(),
+                'idle': measure(app, keypad, args.seconds, server_pid, gpu_files),
+                'drag': drag(app, keypad, args.seconds, args.rate, server_pid, gpu_files),
+            }
+            print(f"{tool} / {render_mode}: idle {result['idle']['cpu_percent']}% "
+                  f"drag {result['drag']['cpu_percent']}% CPU", file=sys.stderr)
+            results.append(result)
+            stop_keypad(app, keypad)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--tools', nargs='+', choices=sorted(TOOL_DIRS),
+                        default=sorted(TOOL_DIRS))
+    parser.add_argument('--modes', nargs='+', choices=RENDER_MODES, default=list(RENDER_MODES))
+    parser.add_argument('--seconds', type=float, default=3.0,
+                        help="seconds per idle and per drag measurement (default 3)")
+    parser.add_argument('--rate', type=int, default=240,
+                        help="pointer events per second while dragging (default 240)")
+    parser.add_argument('--display', help="use this X display instead of starting Xvfb")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    xvfb = None
+    if args.display:
+        os.environ['DISPLAY'] = args.display
+    else:
+        xvfb, os.environ['DISPLAY'] = start_xvfb()
+    # Keep instance sockets and caches away from a running keypad
+    scratch = tempfile.mkdtemp(prefix='keypad-render-')
+    os.environ['XDG_RUNTIME_DIR'] = scratch
+    os.environ['XDG_CACHE_HOME'] = scratch
+    os.environ.setdefault('QT_QPA_PLATFORM', 'xcb')
+
+    try:
+        # The keypads print as they go; keep stdout for the report
+        with contextlib.redirect_stdout(sys.stderr):
+            results = run(args, xvfb.pid if xvfb else None)
+    finally:
+        if xvfb:
+            xvfb.terminate()
+            xvfb.wait()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    report = {
+        'timestamp': time.time(),
+        'display': os.environ['DISPLAY'],
+        'environment': tool_versions(),
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
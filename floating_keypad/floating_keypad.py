@@ -3,29 +3,62 @@
 
 import sys
 import time
+STARTUP_TIME = time.perf_counter()
 import subprocess
 import os
 import signal
 import atexit
 from PyQt5.QtWidgets import (QApplication, QWidget, QPushButton, QVBoxLayout, 
                              QHBoxLayout, QLabel, QSystemTrayIcon, QMenu, QGridLayout)
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt, QTimer, QSocketNotifier, pyqtSignal
 from PyQt5.QtGui import QIcon, QPixmap
-import pyautogui
+from keypad_backends import (KeyDispatcher, KeyInjector, LatencyStats, PressTrace,
+                             StartupProfile, load_settings, probe_tools)
+from keypad_instance import send_command, start_server
+from keypad_style import (DragMover, paint_backdrop, set_button_active, set_button_color,
+                          style_panel)
+from keypad_window import DOCK_ANCHORS, WindowTracker, dock_position
 
 class FloatingKeyboard(QWidget):
-    def __init__(self):
+    # Emitted from the dispatch thread; delivered on the GUI thread
+    latency_recorded = pyqtSignal()
+    
+    def __init__(self, startup_profile=None, host=None):
         super().__init__()
+        self.startup_profile = startup_profile or StartupProfile(0, enabled=False)
+        # A KeypadHost shares its settings, backends and window tracker
+        self.host = host
+        self.first_paint_done = False
         self.inkscape_window_id = None
+        self.window_tracker = None
+        self.auto_hidden = False
         self.collapsed = False
         self.normal_height = 290
         self.collapsed_height = 40
         self.shift_pressed = False
         self.ctrl_pressed = False
+        if host:
+            self.settings = host.settings
+            self.injector = host.injector
+            self.dispatcher = host.dispatcher.channel(self.deliver_key)
+            self.latency = host.latency
+        else:
+            config_file = os.path.join(os.path.dirname(__file__), "floating_keypad.yaml")
+            self.settings = load_settings(config_file)
+            self.startup_profile.mark('settings')
+            self.injector = KeyInjector(self.settings)
+            print(f"Key backends: {self.injector.report()}")
+            self.dispatcher = KeyDispatcher(self.deliver_key, self.settings)
+            self.latency = LatencyStats(self.settings)
+            self.startup_profile.mark('key backends')
         self.init_ui()
         self.setup_window()
-        self.setup_tray_icon()
-        self.find_inkscape_window()
+        self.startup_profile.mark('build ui')
+        self.instance_server = None
+        if not host:
+            self.setup_tray_icon()
+            self.instance_server = start_server('floating_keypad', self.handle_instance_command, self)
+            self.startup_profile.mark('tray and socket')
     
     # === TRAY ICON SETUP ===
     def setup_tray_icon(self):
@@ -41,10 +74,15 @@ class FloatingKeyboard(QWidget):
             quit_action.triggered.connect(self.close_application)
             self.tray_icon.setContextMenu(tray_menu)
             self.tray_icon.activated.connect(self.tray_icon_activated)
+            self.tray_icon.setToolTip("Inkscape Keypad")
+            self.latency_recorded.connect(self.update_latency_tooltip)
             self.tray_icon.show()
         except:
             pass
     
+    def update_latency_tooltip(self):
+        self.tray_icon.setToolTip(f"Inkscape Keypad\n{self.latency.summary()}")
+    
     def tray_icon_activated(self, reason):
         if reason == QSystemTrayIcon.Trigger:
             if self.isVisible():
@@ -53,7 +91,84 @@ class FloatingKeyboard(QWidget):
                 self.show()
     
     # === INKSCAPE WINDOW DETECTION ===
+    def paintEvent(self, event):
+        paint_backdrop(self)
+        super().paintEvent(event)
+        if not self.first_paint_done:
+            self.first_paint_done = True
+            self.startup_profile.mark('first paint')
+            # Window search waits until the keypad is on screen
+            QTimer.singleShot(0, self.finish_startup)
+    
+    def finish_startup(self):
+        self.start_window_tracker()
+        self.startup_profile.mark('window search')
+        self.startup_profile.report()
+    
+    def start_window_tracker(self):
+        try:
+            if self.host:
+                self.window_tracker = self.host.watch_window(self)
+                return
+            self.window_tracker = WindowTracker(self.set_inkscape_window, self.inkscape_moved,
+                                                self.inkscape_focused)
+            self.window_tracker.ignored.add(int(self.winId()))
+            self.tracker_notifier = QSocketNotifier(self.window_tracker.fileno(),
+                                                    QSocketNotifier.Read, self)
+            self.tracker_notifier.activated.connect(self.window_tracker.process_events)
+            self.window_tracker.refresh()
+        except Exception as e:
+            print(f"Window tracker unavailable, using wmctrl: {e}")
+            self.window_tracker = None
+            self.find_inkscape_window()
+    
+    def set_inkscape_window(self, window_id, geometry):
+        self.inkscape_window_id = window_id
+        if window_id:
+            print(f"Found Inkscape window: {window_id}")
+            self.dock(geometry)
+        else:
+            print("Inkscape window closed")
+    
+    def dock(self, geometry):
+        """Move to the dock anchor of the Inkscape window; False if not docking"""
+        anchor = self.settings['dock']
+        if anchor not in DOCK_ANCHORS or not geometry:
+            return False
+        # Panels of one host share the anchor side by side
+        offset = self.host.right_margin(self) - 50 if self.host else 0
+        self.move(*dock_position(anchor, geometry, (self.width(), self.height()),
+                                 int(self.settings['dock_margin']), offset))
+        return True
+    
+    def inkscape_moved(self, window_id, geometry):
+        self.dock(geometry)
+    
+    def inkscape_focused(self, focused):
+        """Hide or fade the panel while another application is active"""
+        mode = self.settings['auto_hide']
+        if mode not in ('hide', 'fade'):
+            return
+        self.dispatcher.suspend(not focused)
+        if mode == 'fade':
+            # A faded panel keeps its last frame and ignores clicks
+            self.setUpdatesEnabled(focused)
+            self.setAttribute(Qt.WA_TransparentForMouseEvents, not focused)
+            self.setWindowOpacity(1.0 if focused else float(self.settings['fade_opacity']))
+        elif not focused and self.isVisible():
+            self.auto_hidden = True
+            self.hide()
+        elif focused and self.auto_hidden:
+            # Only panels hidden here come back; the tray's Hide sticks
+            self.auto_hidden = False
+            self.show()
+    
     def find_inkscape_window(self):
+        if self.window_tracker:
+            self.window_tracker.refresh()
+            self.window_tracker.process_events()
+            return
+        
         try:
             result = subprocess.run(['wmctrl', '-lx'], capture_output=True, text=True)
             for line in result.stdout.split('\n'):
@@ -84,7 +199,6 @@ class FloatingKeyboard(QWidget):
         
         self.title = QLabel("Inkscape Keypad")
         self.title.setAlignment(Qt.AlignCenter)
-        self.title.setStyleSheet("color: white; font-weight: bold; font-size: 12px;")
         self.title.setCursor(Qt.PointingHandCursor)
         self.main_layout.addWidget(self.title)
         
@@ -97,19 +211,19 @@ class FloatingKeyboard(QWidget):
         basic_layout = QHBoxLayout()
         basic_layout.setSpacing(3)
         
-        copy_btn = self.create_button("Copy", lambda: self.send_key_to_inkscape('ctrl+c'))
-        paste_btn = self.create_button("Paste", lambda: self.send_key_to_inkscape('ctrl+v'))
-        cut_btn = self.create_button("Cut", lambda: self.send_key_to_inkscape('ctrl+x'))
+        copy_btn = self.create_key_button("Copy", 'ctrl+c')
+        paste_btn = self.create_key_button("Paste", 'ctrl+v')
+        cut_btn = self.create_key_button("Cut", 'ctrl+x')
         
         arrow_widget = QWidget()
         arrow_layout = QGridLayout(arrow_widget)
         arrow_layout.setSpacing(2)
         arrow_layout.setContentsMargins(0, 0, 0, 0)
         
-        up_btn = self.create_button("↑", lambda: self.send_key_to_inkscape('Up'), size=(25, 25))
-        left_btn = self.create_button("←", lambda: self.send_key_to_inkscape('Left'), size=(25, 25))
-        down_btn = self.create_button("↓", lambda: self.send_key_to_inkscape('Down'), size=(25, 25))
-        right_btn = self.create_button("→", lambda: self.send_key_to_inkscape('Right'), size=(25, 25))
+        up_btn = self.create_key_button("↑", 'Up', size=(25, 25))
+        left_btn = self.create_key_button("←", 'Left', size=(25, 25))
+        down_btn = self.create_key_button("↓", 'Down', size=(25, 25))
+        right_btn = self.create_key_button("→", 'Right', size=(25, 25))
         
         arrow_layout.addWidget(up_btn, 0, 1)
         arrow_layout.addWidget(left_btn, 1, 0)
@@ -125,10 +239,10 @@ class FloatingKeyboard(QWidget):
         edit_layout = QHBoxLayout()
         edit_layout.setSpacing(3)
         
-        undo_btn = self.create_button("Undo", lambda: self.send_key_to_inkscape('ctrl+z'))
-        redo_btn = self.create_button("Redo", lambda: self.send_key_to_inkscape('ctrl+y'))
-        del_btn = self.create_button("Del", lambda: self.send_key_to_inkscape('Delete'))
-        tab_btn = self.create_button("TAB", lambda: self.send_key_to_inkscape('Tab'))
+        undo_btn = self.create_key_button("Undo", 'ctrl+z')
+        redo_btn = self.create_key_button("Redo", 'ctrl+y')
+        del_btn = self.create_key_button("Del", 'Delete')
+        tab_btn = self.create_key_button("TAB", 'Tab')
         
         edit_layout.addWidget(undo_btn)
         edit_layout.addWidget(redo_btn)
@@ -140,9 +254,9 @@ class FloatingKeyboard(QWidget):
         select_layout = QHBoxLayout()
         select_layout.setSpacing(3)
         
-        all_btn = self.create_button("All", lambda: self.send_key_to_inkscape('ctrl+a'))
-        group_btn = self.create_button("Group", lambda: self.send_key_to_inkscape('ctrl+g'))
-        ungroup_btn = self.create_button("Ungrp", lambda: self.send_key_to_inkscape('ctrl+shift+g'))
+        all_btn = self.create_key_button("All", 'ctrl+a', action='app.select-all')
+        group_btn = self.create_key_button("Group", 'ctrl+g', action='app.selection-group')
+        ungroup_btn = self.create_key_button("Ungrp", 'ctrl+shift+g', action='app.selection-ungroup')
         self.shift_btn = self.create_toggle_button("SHIFT", self.toggle_shift)
         
         select_layout.addWidget(all_btn)
@@ -155,9 +269,9 @@ class FloatingKeyboard(QWidget):
         transform_layout = QHBoxLayout()
         transform_layout.setSpacing(3)
         
-        duplicate_btn = self.create_button("Dup", lambda: self.send_key_to_inkscape('ctrl+d'))
-        flip_h_btn = self.create_button("FlipH", lambda: self.send_key_to_inkscape('h'))
-        flip_v_btn = self.create_button("FlipV", lambda: self.send_key_to_inkscape('v'))
+        duplicate_btn = self.create_key_button("Dup", 'ctrl+d')
+        flip_h_btn = self.create_key_button("FlipH", 'h', action='app.object-flip-horizontal')
+        flip_v_btn = self.create_key_button("FlipV", 'v', action='app.object-flip-vertical')
         self.ctrl_btn = self.create_toggle_button("CTRL", self.toggle_ctrl)
         
         transform_layout.addWidget(duplicate_btn)
@@ -170,10 +284,10 @@ class FloatingKeyboard(QWidget):
         layer_layout = QHBoxLayout()
         layer_layout.setSpacing(3)
         
-        raise_btn = self.create_button("Raise", lambda: self.send_key_to_inkscape('Page_Up'))
-        lower_btn = self.create_button("Lower", lambda: self.send_key_to_inkscape('Page_Down'))
-        front_btn = self.create_button("Front", lambda: self.send_key_to_inkscape('Home'))
-        back_btn = self.create_button("Back", lambda: self.send_key_to_inkscape('End'))
+        raise_btn = self.create_key_button("Raise", 'Page_Up', action='app.selection-raise')
+        lower_btn = self.create_key_button("Lower", 'Page_Down', action='app.selection-lower')
+        front_btn = self.create_key_button("Front", 'Home', action='app.selection-top')
+        back_btn = self.create_key_button("Back", 'End', action='app.selection-bottom')
         
         layer_layout.addWidget(raise_btn)
         layer_layout.addWidget(lower_btn)
@@ -185,7 +299,7 @@ class FloatingKeyboard(QWidget):
         util_layout.setSpacing(3)
         
         refresh_btn = self.create_button("↻", self.find_inkscape_window, color="#44aa44")
-        save_btn = self.create_button("Save", lambda: self.send_key_to_inkscape('ctrl+s'), color="#4aa444")
+        save_btn = self.create_key_button("Save", 'ctrl+s', color="#4aa444")
         close_btn = self.create_button("×", self.close_application, color="#ff4444")
         
         util_layout.addWidget(refresh_btn)
@@ -207,45 +321,25 @@ class FloatingKeyboard(QWidget):
     def create_button(self, text, callback, color="#4a90e2", size=(50, 30)):
         btn = QPushButton(text)
         btn.setFixedSize(size[0], size[1])
-        btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {color};
-                color: white;
-                border: 1px solid #333;
-                border-radius: 5px;
-                font-size: 10px;
-                font-weight: bold;
-            }}
-            QPushButton:hover {{
-                background-color: {self.lighten_color(color)};
-            }}
-            QPushButton:pressed {{
-                background-color: {self.darken_color(color)};
-            }}
-        """)
+        set_button_color(btn, color)
         btn.clicked.connect(callback)
         btn.setFocusPolicy(Qt.NoFocus)
         return btn
     
+    def create_key_button(self, text, key, color="#4a90e2", size=(50, 30), action=None):
+        btn = self.create_button(text, lambda: self.send_key_to_inkscape(
+            key, repeat=btn.isDown(), action=action), color, size)
+        # Held buttons re-emit clicked at the configured delay and rate
+        if key in self.settings['repeat_keys']:
+            btn.setAutoRepeat(True)
+            btn.setAutoRepeatDelay(int(self.settings['repeat_delay'] * 1000))
+            btn.setAutoRepeatInterval(max(1, int(1000 / self.settings['repeat_rate'])))
+        return btn
+    
     def create_toggle_button(self, text, callback, color="#4a90e2", size=(50, 30)):
         btn = QPushButton(text)
         btn.setFixedSize(size[0], size[1])
-        btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {color};
-                color: white;
-                border: 1px solid #333;
-                border-radius: 5px;
-                font-size: 10px;
-                font-weight: bold;
-            }}
-            QPushButton:hover {{
-                background-color: {self.lighten_color(color)};
-            }}
-            QPushButton:pressed {{
-                background-color: {self.darken_color(color)};
-            }}
-        """)
+        set_button_color(btn, color)
         btn.clicked.connect(callback)
         btn.setFocusPolicy(Qt.NoFocus)
         return btn
@@ -262,142 +356,121 @@ class FloatingKeyboard(QWidget):
         print(f"CTRL {'ON' if self.ctrl_pressed else 'OFF'}")
     
     def update_toggle_button_style(self, button, pressed):
-        if pressed:
-            button.setStyleSheet("""
-                QPushButton {
-                    background-color: #ff8800;
-                    color: white;
-                    border: 2px solid #ffaa00;
-                    border-radius: 5px;
-                    font-size: 10px;
-                    font-weight: bold;
-                }
-                QPushButton:hover {
-                    background-color: #ffaa00;
-                }
-            """)
-        else:
-            button.setStyleSheet("""
-                QPushButton {
-                    background-color: #4a90e2;
-                    color: white;
-                    border: 1px solid #333;
-                    border-radius: 5px;
-                    font-size: 10px;
-                    font-weight: bold;
-                }
-                QPushButton:hover {
-                    background-color: #5ba0f2;
-                }
-                QPushButton:pressed {
-                    background-color: #3a80d2;
-                }
-            """)
-    
-    # === COLOR UTILITIES ===
-    def lighten_color(self, color):
-        color_map = {
-            "#4a90e2": "#5ba0f2",
-            "#ff4444": "#ff6666",
-            "#44aa44": "#66cc66",
-            "#4aa444": "#6cc466",
-            "#888888": "#aaaaaa"
-        }
-        return color_map.get(color, color)
-        
-    def darken_color(self, color):
-        color_map = {
-            "#4a90e2": "#3a80d2",
-            "#ff4444": "#dd2222",
-            "#44aa44": "#228822",
-            "#4aa444": "#2a8a24",
-            "#888888": "#666666"
-        }
-        return color_map.get(color, color)
+        set_button_active(button, pressed)
     
     # === WINDOW SETUP ===
     def setup_window(self):
         self.setWindowTitle("Inkscape Floating Keypad")
         self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint | Qt.Tool)
-        self.setAttribute(Qt.WA_TranslucentBackground)
         self.setFocusPolicy(Qt.NoFocus)
+        # Coming back with Inkscape must not take the focus away from it
+        self.setAttribute(Qt.WA_ShowWithoutActivating)
         
-        self.setStyleSheet("""
-            QWidget {
-                background-color: rgba(0, 0, 0, 120);
-                border-radius: 10px;
-            }
-        """)
+        style_panel(self, self.title, self.settings['render_mode'])
+        self.drag_mover = DragMover(self)
         
         self.setFixedSize(320, self.normal_height)
         
         screen = QApplication.desktop().screenGeometry()
-        self.move(screen.width() - self.width() - 50, 50)
+        right_margin = self.host.right_margin(self) if self.host else 50
+        self.move(screen.width() - self.width() - right_margin, 50)
     
     # === KEY SENDING ===
-    def send_key_to_inkscape(self, key_combination):
-        try:
-            if not self.inkscape_window_id:
-                self.find_inkscape_window()
-                
-            if self.inkscape_window_id:
-                subprocess.run(['wmctrl', '-i', '-a', self.inkscape_window_id], 
-                             capture_output=True)
-                time.sleep(0.05)
-            else:
-                subprocess.run(['xdotool', 'windowactivate', '--sync', 
-                              '$(xdotool search --class inkscape | head -1)'], 
-                              shell=True, capture_output=True)
-                time.sleep(0.05)
-            
+    def send_key_to_inkscape(self, key_combination, repeat=False, action=None):
+        trace = PressTrace(key_combination)
+        if not self.inkscape_window_id and not self.window_tracker:
+            self.find_inkscape_window()
+        trace.mark('lookup')
+        
+        final_key, action = self.modify_press(key_combination, action)
+        
+        # Delivery runs on the dispatch thread so the keypad never blocks;
+        # repeats of a held key merge into one burst while delivery lags
+        self.dispatcher.submit(final_key, self.inkscape_window_id, action, merge=repeat,
+                               trace=trace)
+    
+    def add_modifiers(self, key_combination):
+        if self.ctrl_pressed and not key_combination.startswith('ctrl'):
+            key_combination = f"ctrl+{key_combination}"
+        if self.shift_pressed and 'shift' not in key_combination:
+            key_combination = f"shift+{key_combination}"
+        return key_combination
+    
+    def modify_press(self, key_combination, action=None):
+        """Apply the SHIFT/CTRL toggles to a key or to every step of a macro"""
+        if isinstance(key_combination, str):
+            final_key = self.add_modifiers(key_combination)
+        elif isinstance(key_combination, list):
+            final_key = [dict(step, key=self.add_modifiers(step['key']))
+                         if isinstance(step, dict) else self.add_modifiers(step)
+                         for step in key_combination]
+        else:
             final_key = key_combination
-            
-            # Add active modifier keys
-            if self.ctrl_pressed and not key_combination.startswith('ctrl'):
-                final_key = f"ctrl+{final_key}"
-            if self.shift_pressed and 'shift' not in key_combination:
-                final_key = f"shift+{final_key}"
-                
-            if '+' in final_key:
-                keys = final_key.replace('ctrl', 'control').replace('+', '+')
-                subprocess.run(['xdotool', 'key', keys], capture_output=True)
+        if final_key != key_combination:
+            # A modified press means something else than the button's action
+            action = None
+        return final_key, action
+    
+    def deliver_key(self, final_key, window_id, action=None, count=1, trace=None):
+        if action:
+            # An Inkscape action needs no focus; its keys are the fallback
+            try:
+                backend = self.injector.send_action(action, count=count)
+                self.record_press(trace, backend)
+                print(f"Ran action: {action} x{count} via {backend}")
+                return
+            except ValueError as e:
+                print(f"Action {action} not run, sending keys: {e}")
+            if final_key is None:
+                return
+        
+        try:
+            if self.injector.targets_inkscape:
+                # The compositor finds and focuses Inkscape itself
+                backend = self.injector.send(final_key, count=count)
+            elif window_id and self.injector.focus_mode == 'direct':
+                backend = self.injector.send_to_window(final_key, window_id, count=count)
             else:
-                subprocess.run(['xdotool', 'key', final_key], capture_output=True)
-                
-            print(f"Sent key: {final_key}")
+                # Raises if no Inkscape window could be raised
+                self.injector.activate_window(window_id, trace)
+                backend = self.injector.send(final_key, count=count)
+            self.record_press(trace, backend)
+            print(f"Sent key: {final_key} x{count} via {backend}")
             
         except Exception as e:
             print(f"Key send error: {e}")
-            print("Please ensure xdotool is installed: sudo apt install xdotool")
-            
-            try:
-                final_key = key_combination
-                modifiers = []
-                if self.ctrl_pressed and not key_combination.startswith('ctrl'):
-                    modifiers.append('ctrl')
-                if self.shift_pressed and 'shift' not in key_combination:
-                    modifiers.append('shift')
-                
-                if modifiers:
-                    if '+' in key_combination:
-                        parts = key_combination.split('+')
-                        pyautogui.hotkey(*(modifiers + parts))
-                    else:
-                        pyautogui.hotkey(*(modifiers + [key_combination]))
-                else:
-                    if '+' in key_combination:
-                        pyautogui.hotkey(*key_combination.split('+'))
-                    else:
-                        pyautogui.press(key_combination.lower())
-                        
-            except Exception as fallback_error:
-                print(f"Fallback error: {fallback_error}")
+    
+    def record_press(self, trace, backend):
+        if trace:
+            trace.mark('inject')
+            trace.backend = backend
+            self.latency.record(trace)
+            self.latency_recorded.emit()
     
     # === WINDOW CONTROLS ===
+    def handle_instance_command(self, command):
+        if command == 'show':
+            self.show()
+            self.raise_()
+            return 'ok'
+        if command == 'quit':
+            QTimer.singleShot(0, self.close_application)
+            return 'ok'
+        return 'unknown'
+    
     def close_application(self):
+        if self.host:
+            self.host.close_application()
+            return
         print("Quitting application...")
         if hasattr(self, 'tray_icon'):
             self.tray_icon.hide()
+        self.dispatcher.stop()
+        self.injector.close()
+        if self.window_tracker:
+            self.window_tracker.close()
+        if self.instance_server:
+            self.instance_server.close()
         self.hide()
         QApplication.quit()
         os._exit(0)
@@ -430,21 +503,17 @@ class FloatingKeyboard(QWidget):
             
     def mouseMoveEvent(self, event):
         if hasattr(self, 'drag_start') and event.buttons() == Qt.LeftButton:
-            self.move(event.globalPos() - self.drag_start)
+            # Pointer events can outpace the display; move once per frame
+            self.drag_mover.move(event.globalPos() - self.drag_start)
+    
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.drag_mover.finish()
 
 # === DEPENDENCY CHECK ===
 def check_dependencies():
-    missing_tools = []
-    
-    try:
-        subprocess.run(['wmctrl', '--version'], capture_output=True, check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        missing_tools.append('wmctrl')
-        
-    try:
-        subprocess.run(['xdotool', '--version'], capture_output=True, check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        missing_tools.append('xdotool')
+    tools = probe_tools(['wmctrl', 'xdotool'])
+    missing_tools = [tool for tool, available in tools.items() if not available]
         
     if missing_tools:
         print("Please install the following tools:")
@@ -454,19 +523,28 @@ def check_dependencies():
 
 # === MAIN APPLICATION ===
 def main():
+    profile = StartupProfile(STARTUP_TIME, '--startup-profile' in sys.argv)
+    profile.mark('imports')
+    
+    if send_command('floating_keypad', 'show'):
+        print("Floating Keypad is already running")
+        return
+    
     check_dependencies()
+    profile.mark('dependency check')
     
     app = QApplication.instance()
     if app is None:
         app = QApplication(sys.argv)
-    
-    pyautogui.FAILSAFE = True
-    pyautogui.PAUSE = 0.05
+    # Sets WM_CLASS, so other keypad processes can tell this one's windows apart
+    app.setApplicationName('floating_keypad')
+    profile.mark('QApplication')
     
     app.setQuitOnLastWindowClosed(False)
     
-    keypad = FloatingKeyboard()
+    keypad = FloatingKeyboard(profile)
     keypad.show()
+    profile.mark('show')
     
     print("Inkscape Floating Keypad started")
     print("Usage:")
@@ -4,14 +4,29 @@
 import inkex
 import os
 import sys
+from keypad_instance import send_command
 
 class FloatingKeypadLauncher(inkex.EffectExtension):
     """Launch floating keypad as Inkscape extension"""
     
+    def add_arguments(self, pars):
+        # Set by keypad_host.inx: run the keypad and the numpad palette in one process
+        pars.add_argument("--host", type=inkex.Boolean, default=False)
+    
     def effect(self):
         ext_dir = os.path.dirname(os.path.abspath(__file__))
         keypad_script = os.path.join(ext_dir, "floating_keypad.py")
         
+        if self.options.host:
+            keypad_script = os.path.join(ext_dir, "keypad_host.py")
+            # The host raises whatever is running and starts only what is not
+            running = [send_command(name, 'show') for name in ('floating_keypad', 'numpad_palette')]
+            if all(running):
+                return
+        # Re-opening raises the running keypad instead of starting another one
+        elif send_command('floating_keypad', 'show'):
+            return
+        
         if not os.path.exists(keypad_script):
             return
         
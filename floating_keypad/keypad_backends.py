@@ -0,0 +1,1331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Key injection backends shared by the floating keypad and the numpad palette.
+
+Shared with numpad_palette/; see SHARED_MODULES in benchmarks/backend_check.py.
+"""
+
+import collections
+import hashlib
+import json
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import threading
+import time
+
+# Key strings use the xdotool syntax: 'ctrl+shift+g', 'Page_Up', 'BackSpace'
+MODIFIER_KEYSYMS = {
+    'ctrl': 'Control_L',
+    'control': 'Control_L',
+    'shift': 'Shift_L',
+    'alt': 'Alt_L',
+    'super': 'Super_L',
+    'meta': 'Meta_L',
+}
+
+MODIFIER_MASKS = {
+    'Control_L': 'ControlMask',
+    'Shift_L': 'ShiftMask',
+    'Alt_L': 'Mod1Mask',
+    'Super_L': 'Mod4Mask',
+    'Meta_L': 'Mod1Mask',
+}
+
+DEFAULT_SETTINGS = {
+    # 'activate': raise Inkscape before typing, skipped when it already has focus
+    # 'direct': send synthetic key events to the Inkscape window, never raise it
+    'focus_mode': 'activate',
+    # Seconds to wait after raising Inkscape before typing
+    'settle_delay': 0.05,
+    # Presses waiting for delivery before the queue policy applies
+    'queue_depth': 8,
+    # 'coalesce': fold a press into the last queued one when it is the same
+    #             key, otherwise discard it
+    # 'drop': discard every press that arrives while the queue is full
+    'queue_policy': 'coalesce',
+    # Re-read the config file as soon as it is saved
+    'auto_reload': True,
+    # Keys that repeat while their button is held: seconds before the first
+    # repeat, then repeats per second
+    'repeat_keys': ['Up', 'Down', 'Left', 'Right'],
+    'repeat_delay': 0.4,
+    'repeat_rate': 20,
+    # Append per-press timings to this file ('' keeps them in memory only)
+    'latency_log': '',
+    # 'jsonl': one JSON object per press
+    # 'chrome': trace events for chrome://tracing or ui.perfetto.dev
+    'latency_format': 'jsonl',
+    # Run buttons that name an Inkscape action over D-Bus instead of typing
+    # their shortcut
+    'inkscape_actions': True,
+    # Failed sends in a row before a backend is set aside for the next one
+    'backend_failures': 3,
+    # Seconds between attempts to bring back a failed or missing backend
+    'backend_reprobe': 30,
+    # How panels are drawn: translucent, opaque or cached (see keypad_style)
+    'render_mode': 'translucent',
+    # Keep panels at this anchor of the Inkscape window (see DOCK_ANCHORS in
+    # keypad_window), or 'none' to place them freely
+    'dock': 'none',
+    # Pixels between a docked panel and the edge of the Inkscape window
+    'dock_margin': 10,
+    # While another application is active: off, hide or fade the panels
+    'auto_hide': 'off',
+    # Window opacity of a faded panel
+    'fade_opacity': 0.3,
+}
+
+LATENCY_PHASES = ('lookup', 'queue', 'activate', 'settle', 'inject')
+
+
+def split_key_combination(key_combination):
+    return [part for part in str(key_combination).split('+') if part]
+
+
+def normalize_steps(keys):
+    """Return [(key_combination, delay_before), ...] for a key or a macro.
+
+    keys is a key string or a list whose items are key strings or
+    {'key': ..., 'delay': seconds to wait before this step}.
+    """
+    if isinstance(keys, str):
+        return [(keys, 0.0)]
+    steps = []
+    for step in keys:
+        if isinstance(step, dict):
+            steps.append((str(step['key']), float(step.get('delay', 0))))
+        else:
+            steps.append((str(step), 0.0))
+    return steps
+
+
+def format_keys(keys):
+    return ', '.join(key for key, _ in normalize_steps(keys))
+
+
+def window_id_to_int(window_id):
+    return int(str(window_id), 16)
+
+
+# === SETTINGS ===
+def merge_settings(overrides):
+    settings = dict(DEFAULT_SETTINGS)
+    if isinstance(overrides, dict):
+        for key, value in overrides.items():
+            if key in settings:
+                settings[key] = value
+            else:
+                print(f"Unknown setting: {key}")
+    return settings
+
+
+def load_settings(config_file):
+    """Read the optional `settings:` block of a YAML config file"""
+    overrides = {}
+    if os.path.exists(config_file):
+        try:
+            overrides = (load_yaml(config_file) or {}).get('settings', {})
+        except Exception as e:
+            print(f"Error loading settings: {e}")
+    return merge_settings(overrides)
+
+
+def load_yaml(config_file, validate=None, schema=1):
+    """Parse a YAML file, reusing a cached result while the file is unchanged.
+
+    The parsed (and, if given, validated) data is cached as JSON keyed by the
+    file's mtime and SHA-1, so a normal start skips YAML parsing entirely.
+    Bump schema when validate changes the shape of what it returns.
+    """
+    with open(config_file, 'rb') as f:
+        raw = f.read()
+    key = {
+        'schema': schema,
+        'mtime': os.stat(config_file).st_mtime,
+        'sha1': hashlib.sha1(raw).hexdigest(),
+    }
+    path_hash = hashlib.sha1(os.path.abspath(config_file).encode('utf-8')).hexdigest()
+    cache_file = os.path.join(cache_dir(), f"config-{path_hash[:16]}.json")
+
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('key') == key:
+            return cached['data']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    import yaml
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    data = yaml.load(raw, Loader=loader)
+    if validate:
+        data = validate(data)
+
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump({'key': key, 'data': data}, f)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Error caching config: {e}")
+    return data
+
+
+# === LAZY IMPORTS ===
+_pyautogui = None
+
+
+def import_pyautogui():
+    """Import pyautogui (and PIL behind it) on the first fallback press only"""
+    global _pyautogui
+    if _pyautogui is None:
+        import pyautogui
+        pyautogui.FAILSAFE = True
+        pyautogui.PAUSE = 0.05
+        _pyautogui = pyautogui
+    return _pyautogui
+
+
+# === TOOL PROBE ===
+def cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'inkscape_keypad')
+
+
+def probe_tools(tools):
+    """Return {tool: available} for command line tools.
+
+    `tool --version` only runs again when PATH or the tool's resolved
+    binary changed since its result was cached on disk. Results are kept
+    per tool, so callers asking for different tools share the cache.
+    """
+    cache_file = os.path.join(cache_dir(), 'tools.json')
+    path = os.environ.get('PATH', '')
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('PATH') != path or not isinstance(cached.get('tools'), dict):
+            raise ValueError("stale tool probe")
+    except (OSError, ValueError):
+        cached = {'PATH': path, 'tools': {}}
+
+    result = {}
+    changed = False
+    for tool in tools:
+        binary = shutil.which(tool)
+        key = [binary, os.path.getmtime(binary)] if binary else None
+        entry = cached['tools'].get(tool)
+        if isinstance(entry, dict) and entry.get('key') == key:
+            result[tool] = entry.get('available', False)
+            continue
+        try:
+            if key is None:
+                raise FileNotFoundError(tool)
+            subprocess.run([tool, '--version'], capture_output=True, check=True)
+            result[tool] = True
+        except (subprocess.CalledProcessError, OSError):
+            result[tool] = False
+        cached['tools'][tool] = {'key': key, 'available': result[tool]}
+        changed = True
+
+    if changed:
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            with open(cache_file, 'w', encoding='utf-8') as f:
+                json.dump(cached, f)
+        except OSError as e:
+            print(f"Error saving tool probe: {e}")
+    return result
+
+
+# === STARTUP PROFILE ===
+class StartupProfile:
+    """Collect per-phase startup timings for --startup-profile"""
+
+    def __init__(self, start_time, enabled=True):
+        self.enabled = enabled
+        self.start_time = start_time
+        self.last_time = start_time
+        self.phases = []
+
+    def mark(self, phase):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last_time))
+        self.last_time = now
+
+    def report(self):
+        if not self.enabled:
+            return
+        print("Startup profile:")
+        for phase, seconds in self.phases:
+            print(f"  {phase:<20} {seconds * 1000:8.1f} ms")
+        print(f"  {'total':<20} {(self.last_time - self.start_time) * 1000:8.1f} ms")
+        self.enabled = False
+
+
+# === PRESS LATENCY ===
+class PressTrace:
+    """Per-phase timings of one press, from the click to the injected key.
+
+    Each mark() closes the phase that ran since the previous mark, the same
+    way StartupProfile does. The GUI thread marks 'lookup', the dispatch
+    thread 'queue' and the delivery code the rest.
+    """
+
+    def __init__(self, keys):
+        self.keys = format_keys(keys)
+        self.start_time = time.perf_counter()
+        self.last_time = self.start_time
+        self.phases = []
+        self.count = 1
+        self.backend = None
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, self.last_time, now - self.last_time))
+        self.last_time = now
+
+    def total(self):
+        return self.last_time - self.start_time
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+class LatencyStats:
+    """Rolling latency of recent presses, with an optional trace file.
+
+    record() runs on the dispatch thread; summary() can be called from any
+    thread. With latency_log set, every press is appended to that file as a
+    JSON line or as Chrome trace events, so stations and backends can be
+    compared after the fact.
+    """
+
+    def __init__(self, settings=None, size=200):
+        self.samples = collections.deque(maxlen=size)
+        self.lock = threading.Lock()
+        self.configure(settings or DEFAULT_SETTINGS)
+
+    def configure(self, settings):
+        path = settings.get('latency_log') or ''
+        self.log_path = os.path.expanduser(str(path)) if path else None
+        self.log_format = settings.get('latency_format', 'jsonl')
+
+    def record(self, trace):
+        durations = {phase: 0.0 for phase in LATENCY_PHASES}
+        for phase, _, seconds in trace.phases:
+            durations[phase] = durations.get(phase, 0.0) + seconds
+        durations['total'] = trace.total()
+        with self.lock:
+            self.samples.append(durations)
+            if self.log_path:
+                self.write_log(trace, durations)
+
+    def write_log(self, trace, durations):
+        try:
+            new_file = not os.path.exists(self.log_path)
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                if self.log_format == 'chrome':
+                    # The closing bracket is optional in the array format,
+                    # so events can be appended as they happen
+                    if new_file:
+                        f.write('[\n')
+                    for event in self.chrome_events(trace):
+                        f.write(json.dumps(event) + ',\n')
+                else:
+                    f.write(json.dumps({
+                        'time': time.time(),
+                        'keys': trace.keys,
+                        'count': trace.count,
+                        'backend': trace.backend,
+                        'ms': {phase: round(seconds * 1000, 3)
+                               for phase, seconds in durations.items()},
+                    }) + '\n')
+        except OSError as e:
+            print(f"Error writing latency log: {e}")
+            self.log_path = None
+
+    def chrome_events(self, trace):
+        def event(name, start, seconds):
+            return {'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': 1,
+                    'ts': round(start * 1e6, 1), 'dur': round(seconds * 1e6, 1),
+                    'args': {'keys': trace.keys, 'count': trace.count,
+                             'backend': trace.backend}}
+        events = [event(trace.keys, trace.start_time, trace.total())]
+        events.extend(event(phase, start, seconds) for phase, start, seconds in trace.phases)
+        return events
+
+    def percentiles(self, phase='total'):
+        """Return (p50, p99) in seconds, or None before the first press"""
+        with self.lock:
+            values = sorted(sample.get(phase, 0.0) for sample in self.samples)
+        if not values:
+            return None
+        return percentile(values, 0.5), percentile(values, 0.99)
+
+    def summary(self):
+        lines = []
+        for phase in ('total',) + LATENCY_PHASES:
+            result = self.percentiles(phase)
+            if result is None:
+                return "No key presses yet"
+            lines.append(f"{phase}: p50 {result[0] * 1000:.1f} ms, "
+                         f"p99 {result[1] * 1000:.1f} ms")
+        return "\n".join(lines)
+
+
+# === XTEST BACKEND ===
+class XTestBackend:
+    """Send key events through the XTEST extension over one open X connection"""
+
+    name = 'xtest'
+
+    def __init__(self):
+        from Xlib import X, XK, display
+        from Xlib.ext import xtest
+        self.X = X
+        self.XK = XK
+        self.xtest = xtest
+        self.display = display.Display()
+        if not self.display.has_extension('XTEST'):
+            self.display.close()
+            raise RuntimeError("X server has no XTEST extension")
+        self.keycode_cache = {}
+
+    def lookup(self, name):
+        """Return (keycode, needs_shift) for a keysym name, cached per name"""
+        if name in self.keycode_cache:
+            return self.keycode_cache[name]
+
+        keysym_name = MODIFIER_KEYSYMS.get(name.lower(), name)
+        keysym = self.XK.string_to_keysym(keysym_name)
+        if not keysym:
+            # 'f4' -> 'F4', 'escape' -> 'Escape'
+            for candidate in (keysym_name.upper(), keysym_name.capitalize()):
+                keysym = self.XK.string_to_keysym(candidate)
+                if keysym:
+                    break
+        if not keysym and len(keysym_name) == 1:
+            keysym = ord(keysym_name)
+        if not keysym:
+            raise ValueError(f"Unknown key: {name}")
+
+        keycode = self.display.keysym_to_keycode(keysym)
+        if not keycode:
+            raise ValueError(f"No keycode for key: {name}")
+        needs_shift = (self.display.keycode_to_keysym(keycode, 0) != keysym and
+                       self.display.keycode_to_keysym(keycode, 1) == keysym)
+
+        self.keycode_cache[name] = (keycode, needs_shift)
+        return keycode, needs_shift
+
+    def press_sequence(self, key_combination):
+        keycodes = []
+        shift_needed = False
+        for part in split_key_combination(key_combination):
+            keycode, needs_shift = self.lookup(part)
+            shift_needed = shift_needed or needs_shift
+            keycodes.append(keycode)
+        if shift_needed:
+            shift_code = self.lookup('shift')[0]
+            if shift_code not in keycodes:
+                keycodes.insert(0, shift_code)
+        return keycodes
+
+    def send(self, steps):
+        # Map every step first: an unknown key must not leave half a macro sent
+        sequences = [(self.press_sequence(key_combination), delay)
+                     for key_combination, delay in steps]
+        for keycodes, delay in sequences:
+            if delay:
+                self.display.sync()
+                time.sleep(delay)
+            for keycode in keycodes:
+                self.xtest.fake_input(self.display, self.X.KeyPress, keycode)
+            for keycode in reversed(keycodes):
+                self.xtest.fake_input(self.display, self.X.KeyRelease, keycode)
+        self.display.sync()
+
+    def probe(self):
+        self.display.sync()
+
+    def send_to_window(self, steps, window_id):
+        """Send the keys with XSendEvent to window_id without changing focus"""
+        from Xlib.protocol import event
+
+        root = self.display.screen().root
+        window = self.display.create_resource_object(
+            'window', window_id_to_int(window_id))
+        events = [(self.window_events(key_combination), delay)
+                  for key_combination, delay in steps]
+        for (state, keycodes), delay in events:
+            if delay:
+                self.display.flush()
+                time.sleep(delay)
+            for keycode in keycodes:
+                for event_class, mask in ((event.KeyPress, self.X.KeyPressMask),
+                                          (event.KeyRelease, self.X.KeyReleaseMask)):
+                    key_event = event_class(
+                        time=self.X.CurrentTime, root=root, window=window,
+                        same_screen=1, child=self.X.NONE,
+                        root_x=0, root_y=0, event_x=0, event_y=0,
+                        state=state, detail=keycode)
+                    window.send_event(key_event, event_mask=mask, propagate=True)
+        self.display.flush()
+
+    def window_events(self, key_combination):
+        """Return (modifier state, keycodes) for XSendEvent"""
+        state = 0
+        keycodes = []
+        for part in split_key_combination(key_combination):
+            keysym_name = MODIFIER_KEYSYMS.get(part.lower())
+            if keysym_name:
+                state |= getattr(self.X, MODIFIER_MASKS[keysym_name])
+                continue
+            keycode, needs_shift = self.lookup(part)
+            if needs_shift:
+                state |= self.X.ShiftMask
+            keycodes.append(keycode)
+        return state, keycodes
+
+    def active_window(self):
+        root = self.display.screen().root
+        atom = self.display.intern_atom('_NET_ACTIVE_WINDOW')
+        prop = root.get_full_property(atom, self.X.AnyPropertyType)
+        if prop and len(prop.value):
+            return int(prop.value[0])
+        return None
+
+    def close(self):
+        try:
+            self.display.close()
+        except Exception:
+            pass
+
+
+# === XDOTOOL BACKEND ===
+class XdotoolBackend:
+    """Fork `xdotool key` for every key, used when XTEST is unavailable"""
+
+    name = 'xdotool'
+
+    def __init__(self):
+        # The cached `xdotool --version` of probe_tools, so no process is started
+        if not probe_tools(['xdotool'])['xdotool']:
+            raise RuntimeError("xdotool is not installed")
+
+    def run(self, args):
+        # A non-zero exit is a failed send, not something to ignore
+        result = subprocess.run(args, capture_output=True)
+        if result.returncode != 0:
+            error = result.stderr.decode('utf-8', 'replace').strip()
+            raise RuntimeError(f"xdotool exited with {result.returncode}: {error}")
+
+    def probe(self):
+        # Run by the ranking thread only, so startup forks nothing
+        self.run(['xdotool', 'version'])
+
+    def command(self, steps, window_id=None):
+        """Build one chained xdotool command line for all steps"""
+        args = ['xdotool']
+        keys = []
+        for key_combination, delay in steps:
+            if delay:
+                if keys:
+                    args += self.key_command(keys, window_id)
+                    keys = []
+                args += ['sleep', str(delay)]
+            keys.append(str(key_combination).replace('ctrl', 'control'))
+        if keys:
+            args += self.key_command(keys, window_id)
+        return args
+
+    def key_command(self, keys, window_id):
+        if window_id:
+            return ['key', '--window', str(window_id)] + keys
+        return ['key'] + keys
+
+    def send(self, steps):
+        self.run(self.command(steps))
+
+    def send_to_window(self, steps, window_id):
+        self.run(self.command(steps, window_id))
+
+    def close(self):
+        pass
+
+
+# === UINPUT BACKEND ===
+EV_SYN = 0x00
+EV_KEY = 0x01
+SYN_REPORT = 0
+BUS_VIRTUAL = 0x06
+
+# Key names (xdotool syntax) to evdev codes from linux/input-event-codes.h.
+# evdev codes are key positions, so symbols assume a US layout.
+UINPUT_KEYCODES = {
+    'Escape': 1, 'minus': 12, 'equal': 13, 'BackSpace': 14, 'Tab': 15,
+    'bracketleft': 26, 'bracketright': 27, 'Return': 28, 'Control_L': 29,
+    'semicolon': 39, 'apostrophe': 40, 'grave': 41, 'Shift_L': 42,
+    'backslash': 43, 'comma': 51, 'period': 52, 'slash': 53, 'KP_Multiply': 55,
+    'Alt_L': 56, 'space': 57, 'Caps_Lock': 58, 'KP_7': 71, 'KP_8': 72,
+    'KP_9': 73, 'KP_Subtract': 74, 'KP_4': 75, 'KP_5': 76, 'KP_6': 77,
+    'KP_Add': 78, 'KP_1': 79, 'KP_2': 80, 'KP_3': 81, 'KP_0': 82,
+    'KP_Decimal': 83, 'KP_Enter': 96, 'Control_R': 97, 'KP_Divide': 98,
+    'Alt_R': 100, 'Home': 102, 'Up': 103, 'Page_Up': 104, 'Prior': 104,
+    'Left': 105, 'Right': 106, 'End': 107, 'Down': 108, 'Page_Down': 109,
+    'Next': 109, 'Insert': 110, 'Delete': 111, 'Super_L': 125, 'Meta_L': 125,
+    'Menu': 139,
+}
+UINPUT_KEYCODES.update({str(digit): 2 + (digit - 1) % 10 for digit in range(10)})
+UINPUT_KEYCODES.update({f"F{n}": 58 + n for n in range(1, 11)})
+UINPUT_KEYCODES.update({'F11': 87, 'F12': 88})
+UINPUT_KEYCODES.update(zip('qwertyuiop', range(16, 26)))
+UINPUT_KEYCODES.update(zip('asdfghjkl', range(30, 39)))
+UINPUT_KEYCODES.update(zip('zxcvbnm', range(44, 51)))
+UINPUT_KEYCODES.update({'-': 12, '=': 13, '[': 26, ']': 27, ';': 39, "'": 40,
+                        '`': 41, '\\': 43, ',': 51, '.': 52, '/': 53, ' ': 57})
+
+# Keys typed as shift plus another key on a US layout
+UINPUT_SHIFTED = {
+    'exclam': '1', 'at': '2', 'numbersign': '3', 'dollar': '4', 'percent': '5',
+    'asciicircum': '6', 'ampersand': '7', 'asterisk': '8', 'parenleft': '9',
+    'parenright': '0', 'underscore': 'minus', 'plus': 'equal',
+    'braceleft': 'bracketleft', 'braceright': 'bracketright', 'colon': 'semicolon',
+    'quotedbl': 'apostrophe', 'asciitilde': 'grave', 'bar': 'backslash',
+    'less': 'comma', 'greater': 'period', 'question': 'slash',
+}
+
+
+class UInputDevice:
+    """A virtual keyboard created through /dev/uinput with plain ioctls"""
+
+    UI_DEV_CREATE = 0x5501
+    UI_DEV_DESTROY = 0x5502
+    UI_DEV_SETUP = 0x405c5503
+    UI_SET_EVBIT = 0x40045564
+    UI_SET_KEYBIT = 0x40045565
+
+    def __init__(self, codes, name='Inkscape Keypad', path='/dev/uinput'):
+        import fcntl
+        self.ioctl = fcntl.ioctl
+        self.fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+        try:
+            self.ioctl(self.fd, self.UI_SET_EVBIT, EV_KEY)
+            for code in sorted(set(codes)):
+                self.ioctl(self.fd, self.UI_SET_KEYBIT, code)
+            # struct uinput_setup: input_id, name[80], ff_effects_max
+            setup = struct.pack('HHHH80sI', BUS_VIRTUAL, 0x1, 0x1, 1,
+                                name.encode('utf-8'), 0)
+            self.ioctl(self.fd, self.UI_DEV_SETUP, setup)
+            self.ioctl(self.fd, self.UI_DEV_CREATE)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def write(self, event_type, code, value):
+        # struct input_event; the kernel stamps the time itself
+        os.write(self.fd, struct.pack('llHHi', 0, 0, event_type, code, value))
+
+    def syn(self):
+        self.write(EV_SYN, SYN_REPORT, 0)
+
+    def close(self):
+        try:
+            self.ioctl(self.fd, self.UI_DEV_DESTROY)
+        finally:
+            os.close(self.fd)
+
+
+class UInputBackend:
+    """Type keys on one persistent /dev/uinput virtual keyboard.
+
+    The compositor sees a real keyboard, so this reaches native Wayland
+    windows as well as X11 ones; keys go to whichever window has focus.
+    The device is created once and every press is a few write() calls.
+    Pass any object with write(type, code, value), syn() and close() as
+    device to run the backend without /dev/uinput.
+    """
+
+    name = 'uinput'
+    # Types into the focused window; X window ids mean nothing to it
+    addresses_windows = False
+
+    def __init__(self, device=None):
+        self.device = device or UInputDevice(UINPUT_KEYCODES.values())
+        self.code_cache = {}
+
+    def lookup(self, name):
+        """Return (code, needs_shift) for a key name, cached per name"""
+        if name in self.code_cache:
+            return self.code_cache[name]
+
+        keysym_name = MODIFIER_KEYSYMS.get(name.lower(), name)
+        result = None
+        for candidate in (keysym_name, keysym_name.capitalize(), keysym_name.upper()):
+            if candidate in UINPUT_KEYCODES:
+                result = (UINPUT_KEYCODES[candidate], False)
+                break
+            if candidate in UINPUT_SHIFTED:
+                result = (UINPUT_KEYCODES[UINPUT_SHIFTED[candidate]], True)
+                break
+        if result is None and len(keysym_name) == 1 and keysym_name.lower() in UINPUT_KEYCODES:
+            # 'A' -> shift+a
+            result = (UINPUT_KEYCODES[keysym_name.lower()], keysym_name.isupper())
+        if result is None:
+            raise ValueError(f"Unknown key: {name}")
+
+        self.code_cache[name] = result
+        return result
+
+    def press_sequence(self, key_combination):
+        codes = []
+        shift_needed = False
+        for part in split_key_combination(key_combination):
+            code, needs_shift = self.lookup(part)
+            shift_needed = shift_needed or needs_shift
+            codes.append(code)
+        if shift_needed and UINPUT_KEYCODES['Shift_L'] not in codes:
+            codes.insert(0, UINPUT_KEYCODES['Shift_L'])
+        return codes
+
+    def send(self, steps):
+        # Map every step first: an unknown key must not leave half a macro typed
+        sequences = [(self.press_sequence(key_combination), delay)
+                     for key_combination, delay in steps]
+        for codes, delay in sequences:
+            if delay:
+                time.sleep(delay)
+            for code in codes:
+                self.device.write(EV_KEY, code, 1)
+                self.device.syn()
+            for code in reversed(codes):
+                self.device.write(EV_KEY, code, 0)
+                self.device.syn()
+
+    def probe(self):
+        # An empty report reaches the compositor without typing anything
+        self.device.syn()
+
+    def send_to_window(self, steps, window_id):
+        raise ValueError("uinput cannot address a window")
+
+    def close(self):
+        try:
+            self.device.close()
+        except Exception:
+            pass
+
+
+# === HYPRLAND BACKEND ===
+class InkscapeNotFound(RuntimeError):
+    """No Inkscape window to send to; the press is dropped, not passed on"""
+
+
+HYPRLAND_MODIFIERS = {'ctrl': 'CTRL', 'control': 'CTRL', 'shift': 'SHIFT',
+                      'alt': 'ALT', 'meta': 'ALT', 'super': 'SUPER'}
+
+
+def hyprland_socket_path():
+    signature = os.environ.get('HYPRLAND_INSTANCE_SIGNATURE')
+    if not signature:
+        return None
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR', '')
+    for base in (os.path.join(runtime_dir, 'hypr'), '/tmp/hypr'):
+        path = os.path.join(base, signature, '.socket.sock')
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def is_inkscape_client(client):
+    return 'inkscape' in str(client.get('class', '')).lower()
+
+
+class HyprlandBackend:
+    """Find, focus and type into Inkscape through Hyprland's IPC socket.
+
+    Hyprland answers one request per connection. Each press looks up the
+    Inkscape client the user is working in (j/activewindow, else j/clients)
+    and sends one [[BATCH]] request: focuswindow (unless in direct mode)
+    followed by a sendshortcut per key, all addressed to that client. No
+    hyprctl process is started, and this reaches native Wayland windows,
+    which wmctrl cannot raise.
+    """
+
+    name = 'hyprland'
+    # Finds and focuses Inkscape itself; the keypad's X window id is unused
+    targets_inkscape = True
+
+    def __init__(self, socket_path=None):
+        self.socket_path = socket_path or hyprland_socket_path()
+        if not self.socket_path:
+            raise RuntimeError("not running under Hyprland")
+        self.focus = True
+
+    def configure(self, settings):
+        self.focus = settings.get('focus_mode', 'activate') != 'direct'
+
+    def probe(self):
+        self.request('j/version')
+
+    def request(self, command):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.settimeout(1.0)
+        try:
+            client.connect(self.socket_path)
+            client.sendall(command.encode('utf-8'))
+            chunks = []
+            while True:
+                chunk = client.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        finally:
+            client.close()
+        return b''.join(chunks).decode('utf-8', 'replace')
+
+    def find_inkscape(self):
+        """Return the address of the active Inkscape client, else the last focused one"""
+        active = json.loads(self.request('j/activewindow') or '{}')
+        if is_inkscape_client(active):
+            return active['address']
+        clients = [client for client in json.loads(self.request('j/clients'))
+                   if is_inkscape_client(client)]
+        if not clients:
+            # Abort the press rather than let uinput type into another app
+            raise InkscapeNotFound("no Inkscape window")
+        clients.sort(key=lambda client: client.get('focusHistoryID', 0))
+        return clients[0]['address']
+
+    def shortcut(self, key_combination, address):
+        *modifiers, key = split_key_combination(key_combination)
+        try:
+            mods = ' '.join(HYPRLAND_MODIFIERS[m.lower()] for m in modifiers)
+        except KeyError as e:
+            raise ValueError(f"Unknown modifier: {e}")
+        return f"dispatch sendshortcut {mods},{key},address:{address}"
+
+    def dispatch(self, commands):
+        reply = self.request('[[BATCH]]' + ';'.join(commands))
+        if reply.replace('ok', '').strip():
+            raise ValueError(f"Hyprland refused: {reply.strip()}")
+
+    def send(self, steps):
+        # Looked up on every press: the user may have switched documents
+        self.send_batches(steps, self.find_inkscape())
+
+    def send_batches(self, steps, address):
+        # Build every batch first, so a bad step sends nothing at all
+        batches = [(0, [f"dispatch focuswindow address:{address}"] if self.focus else [])]
+        for key_combination, delay in steps:
+            if delay:
+                batches.append((delay, []))
+            batches[-1][1].append(self.shortcut(key_combination, address))
+        for delay, commands in batches:
+            time.sleep(delay)
+            if commands:
+                self.dispatch(commands)
+
+    def send_to_window(self, steps, window_id):
+        self.send(steps)
+
+    def close(self):
+        pass
+
+
+# === INKSCAPE ACTIONS ===
+class InkscapeActionBackend:
+    """Activate Inkscape's Gio actions over one session bus connection.
+
+    Inkscape 1.x exports its application actions ('app.object-flip-horizontal')
+    and the first window's actions ('win.canvas-zoom-page') through the
+    org.gtk.Actions interface, so an action needs neither focus nor the
+    right keymap. Any action that cannot be run raises ValueError and the
+    caller falls back to the button's keys.
+    """
+
+    name = 'dbus'
+    BUS_NAME = 'org.inkscape.Inkscape'
+    OBJECT_PATHS = {
+        'app': '/org/inkscape/Inkscape',
+        'win': '/org/inkscape/Inkscape/window/1',
+    }
+
+    def __init__(self, connection=None, bus_name=BUS_NAME):
+        from gi.repository import Gio, GLib
+        self.GLib = GLib
+        self.connection = connection or Gio.bus_get_sync(Gio.BusType.SESSION, None)
+        self.call_flags = Gio.DBusCallFlags.NONE
+        self.bus_name = bus_name
+        self.action_names = {}
+
+    def call(self, path, method, parameters):
+        try:
+            return self.connection.call_sync(
+                self.bus_name, path, 'org.gtk.Actions', method, parameters,
+                None, self.call_flags, 1000, None)
+        except self.GLib.Error as e:
+            # Inkscape is not running or was restarted; list actions again
+            self.action_names.clear()
+            raise ValueError(f"Inkscape D-Bus call failed: {e.message}")
+
+    def target(self, action):
+        prefix, _, name = str(action).partition('.')
+        if prefix not in self.OBJECT_PATHS or not name:
+            raise ValueError(f"Unsupported action: {action}")
+        path = self.OBJECT_PATHS[prefix]
+        if path not in self.action_names:
+            self.action_names[path] = set(self.call(path, 'List', None).unpack()[0])
+        if name not in self.action_names[path]:
+            raise ValueError(f"Unknown action: {action}")
+        return path, name
+
+    def activate(self, action, count=1):
+        path, name = self.target(action)
+        parameters = self.GLib.Variant('(sava{sv})', (name, [], {}))
+        for _ in range(count):
+            self.call(path, 'Activate', parameters)
+
+    def close(self):
+        pass
+
+
+# === PYAUTOGUI BACKEND ===
+class PyAutoGUIBackend:
+    """Type keys with pyautogui, the last resort; imported on first use"""
+
+    name = 'pyautogui'
+
+    def __init__(self):
+        import importlib.util
+        if importlib.util.find_spec('pyautogui') is None:
+            raise RuntimeError("pyautogui is not installed")
+
+    def send(self, steps):
+        pyautogui = import_pyautogui()
+        for key_combination, delay in steps:
+            time.sleep(delay)
+            if '+' in key_combination:
+                pyautogui.hotkey(*key_combination.split('+'))
+            else:
+                pyautogui.press(key_combination.lower())
+
+    def send_to_window(self, steps, window_id):
+        raise ValueError("pyautogui cannot address a window")
+
+    def close(self):
+        pass
+
+
+# === INJECTOR ===
+def default_backend_tiers():
+    """Backend classes by tier, preferred first within each tier.
+
+    On Wayland XTEST and xdotool only reach XWayland windows, so the
+    compositor (Hyprland) and the uinput keyboard rank above them.
+    pyautogui is always the last resort.
+    """
+    x11 = (XTestBackend, XdotoolBackend)
+    if os.environ.get('HYPRLAND_INSTANCE_SIGNATURE'):
+        return [(HyprlandBackend,), (UInputBackend,), x11, (PyAutoGUIBackend,)]
+    if os.environ.get('WAYLAND_DISPLAY') or os.environ.get('XDG_SESSION_TYPE') == 'wayland':
+        return [(UInputBackend,), x11, (PyAutoGUIBackend,)]
+    return [x11, (PyAutoGUIBackend,)]
+
+
+class KeyInjector:
+    """Route keys to the fastest working backend.
+
+    Startup opens the first backend that works, in tier order (see
+    default_backend_tiers; backend_classes makes a single tier), without
+    timing it. A ranking thread then times it and the other backends of
+    its tier with a probe that types nothing, and the fastest goes first;
+    backends without a probe go last. Backends of later tiers are opened
+    and timed the first time a press falls through to them, on the
+    dispatch thread. A backend that cannot map a key passes that key on to
+    the next one. A backend that fails backend_failures sends in a row is
+    set aside, and set-aside or missing backends are probed again every
+    backend_reprobe seconds, so the preferred one takes over again once it
+    works.
+    """
+
+    def __init__(self, settings=None, backend_classes=None):
+        tiers = default_backend_tiers() if backend_classes is None else [backend_classes]
+        self.ranks = {}
+        for tier, classes in enumerate(tiers):
+            for backend_class in classes:
+                self.ranks[backend_class] = (tier, None)
+        self.backends = []
+        self.pending = list(self.ranks)
+        self.waiting = []
+        self.failures = {}
+        self.actions = None
+        # Held while the backend list changes or a press walks it
+        self.lock = threading.RLock()
+        self.configure(settings or DEFAULT_SETTINGS)
+        while self.pending and not self.open_backend(self.pending.pop(0), timed=False):
+            pass
+        self.last_probe = time.monotonic()
+        if self.backends:
+            # Probes may start processes (xdotool); keep them off the GUI thread
+            threading.Thread(target=self.rank_tier, daemon=True).start()
+
+    @property
+    def name(self):
+        return self.backends[0].name if self.backends else 'none'
+
+    @property
+    def targets_inkscape(self):
+        """True when the first backend finds and focuses Inkscape on its own"""
+        return bool(self.backends) and getattr(self.backends[0], 'targets_inkscape', False)
+
+    @property
+    def addresses_windows(self):
+        """False when the first backend can only type into the focused window"""
+        return bool(self.backends) and getattr(self.backends[0], 'addresses_windows', True)
+
+    def configure(self, settings):
+        self.settings = settings
+        self.focus_mode = settings.get('focus_mode', 'activate')
+        self.settle_delay = float(settings.get('settle_delay', 0.05))
+        self.max_failures = max(1, int(settings.get('backend_failures', 3)))
+        self.reprobe_interval = float(settings.get('backend_reprobe', 30))
+        for backend in self.backends:
+            if hasattr(backend, 'configure'):
+                backend.configure(settings)
+        self.use_actions = bool(settings.get('inkscape_actions', True))
+
+    # --- Backend registry ---
+    def open_backend(self, backend_class, quiet=False, timed=True):
+        """Open and time a backend; return False and keep it waiting if it fails"""
+        backend = None
+        latency = None
+        try:
+            backend = backend_class()
+            if timed:
+                latency = self.probe(backend)
+        except Exception as e:
+            if not quiet:
+                print(f"Key backend {backend_class.name} unavailable: {e}")
+            if backend is not None:
+                backend.close()
+            if backend_class not in self.waiting:
+                self.waiting.append(backend_class)
+            return False
+
+        if hasattr(backend, 'configure'):
+            backend.configure(self.settings)
+        self.ranks[backend_class] = (self.ranks[backend_class][0], latency)
+        self.failures[backend_class] = 0
+        self.backends.append(backend)
+        self.backends.sort(key=lambda b: self.sort_key(type(b)))
+        return True
+
+    def probe(self, backend):
+        """Return the seconds backend takes for a probe, or None without one"""
+        if not hasattr(backend, 'probe'):
+            return None
+        started = time.perf_counter()
+        backend.probe()
+        return time.perf_counter() - started
+
+    def rank_tier(self):
+        """Time the first backend and open its tier-mates, fastest first"""
+        with self.lock:
+            if not self.backends:
+                return
+            first = self.backends[0]
+            tier = self.ranks[type(first)][0]
+            try:
+                self.ranks[type(first)] = (tier, self.probe(first))
+            except Exception as e:
+                print(f"Key backend {first.name} failed its probe: {e}")
+                self.failures[type(first)] = self.max_failures
+                self.set_aside(first)
+            for backend_class in [c for c in self.pending if self.ranks[c][0] == tier]:
+                self.pending.remove(backend_class)
+                self.open_backend(backend_class, quiet=True)
+            self.backends.sort(key=lambda b: self.sort_key(type(b)))
+            print(f"Key backends: {self.report()}")
+
+    def sort_key(self, backend_class):
+        tier, latency = self.ranks[backend_class]
+        return (tier, latency is None, latency or 0.0)
+
+    def open_pending(self):
+        """Open the backends startup skipped; True if any of them works"""
+        with self.lock:
+            opened = False
+            while self.pending:
+                opened = self.open_backend(self.pending.pop(0)) or opened
+            if opened:
+                print(f"Key backends: {self.report()}")
+            return opened
+
+    def set_aside(self, backend):
+        print(f"Key backend {backend.name} set aside after "
+              f"{self.failures[type(backend)]} failures")
+        backend.close()
+        self.backends.remove(backend)
+        self.waiting.append(type(backend))
+
+    def reprobe(self):
+        """Try waiting backends again, at most every backend_reprobe seconds"""
+        if not self.waiting or time.monotonic() - self.last_probe < self.reprobe_interval:
+            return
+        self.last_probe = time.monotonic()
+        for backend_class in list(self.waiting):
+            self.waiting.remove(backend_class)
+            if self.open_backend(backend_class, quiet=True):
+                print(f"Key backend {backend_class.name} is back")
+
+    def report(self):
+        """Return 'name (0.1 ms), ...' in the order backends are tried"""
+        names = []
+        for backend in self.backends:
+            latency = self.ranks[type(backend)][1]
+            names.append(backend.name if latency is None
+                         else f"{backend.name} ({latency * 1000:.1f} ms)")
+        if self.pending:
+            names.append(f"{len(self.pending)} more not opened yet")
+        return ', '.join(names) or 'none'
+
+    # --- Sending ---
+    def send(self, keys, count=1):
+        """Send a key or a macro count times as one batched injection"""
+        return self.call_backends('send', normalize_steps(keys) * count)
+
+    def send_to_window(self, keys, window_id, count=1):
+        return self.call_backends('send_to_window', normalize_steps(keys) * count,
+                                  window_id)
+
+    def active_window(self):
+        """Return the focused window id, or None when no backend can tell cheaply"""
+        with self.lock:
+            if not any(hasattr(backend, 'active_window') for backend in self.backends):
+                # uinput first on Wayland: XTEST may still be waiting to be opened
+                self.open_pending()
+            for backend in self.backends:
+                if hasattr(backend, 'active_window'):
+                    try:
+                        return backend.active_window()
+                    except Exception as e:
+                        print(f"Active window query failed: {e}")
+            return None
+
+    def activate_window(self, window_id, trace=None):
+        """Raise window_id, or any Inkscape window when it is None.
+
+        Nothing is done when it is already active, or when there is no X
+        window id and the first backend types into the focused window
+        (native Wayland Inkscape has no X window to raise). Returns True if
+        a window was raised and raises RuntimeError if that failed, so keys
+        are not typed into whatever else has focus.
+        """
+        if ((window_id and self.active_window() == window_id_to_int(window_id)) or
+                (not window_id and not self.addresses_windows)):
+            if trace:
+                trace.mark('activate')
+            return False
+        if window_id:
+            command = ['wmctrl', '-i', '-a', window_id]
+        else:
+            command = ['xdotool', 'search', '--class', 'inkscape',
+                       'windowactivate', '--sync', '%1']
+        result = subprocess.run(command, capture_output=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"{command[0]} could not raise Inkscape "
+                               f"(exit {result.returncode})")
+        if trace:
+            trace.mark('activate')
+        time.sleep(self.settle_delay)
+        if trace:
+            trace.mark('settle')
+        return True
+
+    def send_action(self, action, count=1):
+        """Run an Inkscape action; ValueError means send the keys instead"""
+        if not self.use_actions:
+            raise ValueError("Inkscape actions are off")
+        if self.actions is None:
+            # Connect on the first action press so startup skips importing gi
+            try:
+                self.actions = InkscapeActionBackend()
+            except Exception as e:
+                print(f"Inkscape actions unavailable, using keys: {e}")
+                self.actions = False
+        if not self.actions:
+            raise ValueError("Inkscape actions unavailable")
+        self.actions.activate(action, count)
+        return self.actions.name
+
+    def call_backends(self, method, *args, **kwargs):
+        with self.lock:
+            self.reprobe()
+            tried = set()
+            while True:
+                for backend in list(self.backends):
+                    if backend not in tried:
+                        tried.add(backend)
+                        name = self.call_backend(backend, method, *args, **kwargs)
+                        if name:
+                            return name
+                # Every open backend passed the press on; open the rest once
+                if not self.open_pending():
+                    raise RuntimeError("No key injection backend available")
+
+    def call_backend(self, backend, method, *args, **kwargs):
+        """Return the backend's name if it sent the keys, None to try the next one"""
+        try:
+            getattr(backend, method)(*args, **kwargs)
+            self.failures[type(backend)] = 0
+            return backend.name
+        except InkscapeNotFound:
+            raise
+        except ValueError as e:
+            print(f"Key backend {backend.name} skipped: {e}")
+        except Exception as e:
+            # Try the next backend for this press; give up on this one
+            # only when it keeps failing
+            print(f"Key backend {backend.name} failed: {e}")
+            self.failures[type(backend)] += 1
+            if self.failures[type(backend)] >= self.max_failures:
+                self.set_aside(backend)
+        return None
+
+    def close(self):
+        with self.lock:
+            for backend in self.backends:
+                backend.close()
+            self.backends = []
+            self.pending = []
+            self.waiting = []
+
+
+# === DISPATCH QUEUE ===
+class KeyDispatcher:
+    """Deliver key presses in order on a worker thread.
+
+    submit() is called from the Qt GUI thread and never blocks; deliver is
+    called on the worker as deliver(*args, count=n, trace=t), where t is the
+    PressTrace given to submit() with its 'queue' phase marked. When
+    Inkscape falls behind and queue_depth presses are already waiting,
+    queue_policy decides whether a new press is folded into the last queued
+    one or discarded.
+    Auto-repeat presses are submitted with merge=True and always fold into
+    a matching last entry, so a held button that outruns delivery turns
+    into one burst instead of a growing queue.
+
+    Several panels can share one dispatcher through channel(deliver): their
+    presses keep one order and one worker, and each is delivered by the
+    deliver function of the channel it came from.
+
+    suspend(True) drops waiting presses and refuses new ones until
+    suspend(False), for while the panels are hidden.
+    """
+
+    def __init__(self, deliver=None, settings=None):
+        self.deliver = deliver
+        self.configure(settings or DEFAULT_SETTINGS)
+        self.queue = collections.deque()
+        self.condition = threading.Condition()
+        self.suspended = False
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name='key-dispatch', daemon=True)
+        self.thread.start()
+
+    def configure(self, settings):
+        self.max_depth = max(1, int(settings.get('queue_depth', 8)))
+        self.policy = settings.get('queue_policy', 'coalesce')
+
+    def channel(self, deliver):
+        return DispatchChannel(self, deliver)
+
+    def submit(self, *args, merge=False, trace=None, deliver=None, count=1):
+        """Queue a press, count times as one entry; return False if it was discarded"""
+        deliver = deliver or self.deliver
+        with self.condition:
+            if self.suspended:
+                return False
+            last = self.queue[-1] if self.queue else None
+            same = last is not None and last[0] == args and last[3] == deliver
+            # A folded press is timed as part of the entry it joins
+            if merge and same:
+                last[1] += count
+                return True
+            if len(self.queue) >= self.max_depth:
+                if self.policy == 'coalesce' and same:
+                    last[1] += count
+                    return True
+                print(f"Key queue full, dropped: {format_keys(args[0])}")
+                return False
+            self.queue.append([args, count, trace, deliver])
+            self.condition.notify()
+            return True
+
+    def pending(self):
+        with self.condition:
+            return len(self.queue)
+
+    def suspend(self, suspended):
+        with self.condition:
+            self.suspended = suspended
+            if suspended:
+                self.queue.clear()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.queue:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                args, count, trace, deliver = self.queue.popleft()
+            if trace:
+                trace.mark('queue')
+                trace.count = count
+            try:
+                deliver(*args, count=count, trace=trace)
+            except Exception as e:
+                print(f"Key dispatch error: {e}")
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.queue.clear()
+            self.condition.notify()
+
+
+class DispatchChannel:
+    """One panel's view of a KeyDispatcher shared with other panels.
+
+    The owner of the dispatcher configures, suspends and stops it, so
+    configure(), suspend() and stop() do nothing here.
+    """
+
+    def __init__(self, dispatcher, deliver):
+        self.dispatcher = dispatcher
+        self.deliver = deliver
+
+    def configure(self, settings):
+        pass
+
+    def submit(self, *args, merge=False, trace=None, count=1):
+        return self.dispatcher.submit(*args, merge=merge, trace=trace, deliver=self.deliver,
+                                      count=count)
+
+    def pending(self):
+        return self.dispatcher.pending()
+
+    def suspend(self, suspended):
+        pass
+
+    def stop(self):
+        pass
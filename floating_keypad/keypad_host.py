@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Run the floating keypad and the numpad palette in one process.
+
+Both panels share one QApplication, one tray icon, one window tracker, one
+key injector and dispatch thread, and the settings block of
+floating_keypad.yaml. SHIFT/CTRL toggled on the keypad also apply to
+palette presses. The numpad palette is found in its own extension
+directory next to this one; without it only the keypad is shown.
+"""
+
+import sys
+import time
+STARTUP_TIME = time.perf_counter()
+import os
+import signal
+from PyQt5.QtWidgets import QApplication, QSystemTrayIcon, QMenu
+from PyQt5.QtCore import QObject, Qt, QSocketNotifier
+from PyQt5.QtGui import QIcon, QPixmap
+from keypad_backends import (KeyDispatcher, KeyInjector, LatencyStats, StartupProfile,
+                             load_settings)
+from keypad_instance import send_command, start_server
+from keypad_window import WindowTracker
+
+EXT_DIR = os.path.dirname(os.path.abspath(__file__))
+NUMPAD_DIR = os.path.join(os.path.dirname(EXT_DIR), 'numpad_palette')
+
+# Instance names the panels answer to, so their own launchers find the host
+PANEL_TITLES = {
+    'floating_keypad': "Inkscape Keypad",
+    'numpad_palette': "Numpad Palette",
+}
+
+class KeypadHost(QObject):
+    def __init__(self, startup_profile=None):
+        super().__init__()
+        self.startup_profile = startup_profile or StartupProfile(0, enabled=False)
+        self.settings = load_settings(os.path.join(EXT_DIR, "floating_keypad.yaml"))
+        self.startup_profile.mark('settings')
+        self.injector = KeyInjector(self.settings)
+        print(f"Key backends: {self.injector.report()}")
+        self.dispatcher = KeyDispatcher(settings=self.settings)
+        self.latency = LatencyStats(self.settings)
+        self.startup_profile.mark('key backends')
+        self.panels = {}
+        self.instance_servers = []
+        self.keypad = None
+        self.window_tracker = None
+        self.tracker_failed = False
+        self.inkscape_window = (None, None)
+
+    def add_panel(self, name, panel):
+        self.panels[name] = panel
+        if name == 'floating_keypad':
+            self.keypad = panel
+        panel.latency_recorded.connect(self.update_latency_tooltip)
+        server = start_server(name, panel.handle_instance_command, self)
+        if server:
+            self.instance_servers.append(server)
+
+    def right_margin(self, panel):
+        """Distance from the screen's right edge, so panels sit side by side"""
+        margin = 50
+        for other in self.panels.values():
+            if other is panel:
+                break
+            margin += other.width() + 10
+        return margin
+
+    # === SHARED MODIFIERS ===
+    def modify_press(self, key_combination, action=None):
+        if self.keypad:
+            return self.keypad.modify_press(key_combination, action)
+        return key_combination, action
+
+    # === WINDOW TRACKING ===
+    def watch_window(self, panel):
+        """Return the shared WindowTracker, starting it for the first panel.
+
+        Later panels are told the current Inkscape window right away. Raises
+        like WindowTracker when there is no X connection, so the panel falls
+        back to wmctrl.
+        """
+        if self.tracker_failed:
+            raise RuntimeError("window tracker unavailable")
+        if self.window_tracker:
+            self.window_tracker.ignored.add(int(panel.winId()))
+            if self.inkscape_window[0]:
+                panel.set_inkscape_window(*self.inkscape_window)
+            return self.window_tracker
+        try:
+            self.window_tracker = WindowTracker(self.set_inkscape_window, self.inkscape_moved,
+                                                self.inkscape_focused)
+            # Every panel is shown before the first one starts the tracker
+            for other in self.panels.values():
+                self.window_tracker.ignored.add(int(other.winId()))
+            self.tracker_notifier = QSocketNotifier(self.window_tracker.fileno(),
+                                                    QSocketNotifier.Read, self)
+            self.tracker_notifier.activated.connect(self.window_tracker.process_events)
+            self.window_tracker.refresh()
+        except Exception:
+            self.tracker_failed = True
+            self.window_tracker = None
+            raise
+        return self.window_tracker
+
+    def set_inkscape_window(self, window_id, geometry):
+        self.inkscape_window = (window_id, geometry)
+        for panel in self.panels.values():
+            panel.set_inkscape_window(window_id, geometry)
+
+    def inkscape_focused(self, focused):
+        if self.settings['auto_hide'] in ('hide', 'fade'):
+            self.dispatcher.suspend(not focused)
+        for panel in self.panels.values():
+            panel.inkscape_focused(focused)
+
+    def inkscape_moved(self, window_id, geometry):
+        self.inkscape_window = (window_id, geometry)
+        for panel in self.panels.values():
+            panel.inkscape_moved(window_id, geometry)
+
+    # === TRAY ICON SETUP ===
+    def setup_tray_icon(self):
+        try:
+            self.tray_icon = QSystemTrayIcon(self)
+            pixmap = QPixmap(16, 16)
+            pixmap.fill(Qt.blue)
+            self.tray_icon.setIcon(QIcon(pixmap))
+
+            tray_menu = QMenu()
+            for name, panel in self.panels.items():
+                toggle_action = tray_menu.addAction(f"Show/Hide {PANEL_TITLES[name]}")
+                toggle_action.triggered.connect(lambda checked, p=panel: self.toggle_panel(p))
+            if 'numpad_palette' in self.panels:
+                reload_action = tray_menu.addAction("Reload Config")
+                reload_action.triggered.connect(self.panels['numpad_palette'].reload_config)
+            tray_menu.addSeparator()
+            quit_action = tray_menu.addAction("Quit")
+            quit_action.triggered.connect(self.close_application)
+            self.tray_icon.setContextMenu(tray_menu)
+            self.tray_icon.activated.connect(self.tray_icon_activated)
+            self.tray_icon.setToolTip("Inkscape Keypads")
+            self.tray_icon.show()
+        except:
+            pass
+
+    def update_latency_tooltip(self):
+        if hasattr(self, 'tray_icon'):
+            self.tray_icon.setToolTip(f"Inkscape Keypads\n{self.latency.summary()}")
+
+    def toggle_panel(self, panel):
+        if panel.isVisible():
+            panel.hide()
+        else:
+            panel.show()
+            panel.raise_()
+
+    def tray_icon_activated(self, reason):
+        if reason == QSystemTrayIcon.Trigger:
+            # One click hides every panel, or brings them all back
+            visible = any(panel.isVisible() for panel in self.panels.values())
+            for panel in self.panels.values():
+                panel.setVisible(not visible)
+
+    def close_application(self):
+        print("Quitting application...")
+        if hasattr(self, 'tray_icon'):
+            self.tray_icon.hide()
+        self.dispatcher.stop()
+        self.injector.close()
+        if self.window_tracker:
+            self.window_tracker.close()
+        for server in self.instance_servers:
+            server.close()
+        for panel in self.panels.values():
+            panel.hide()
+        QApplication.quit()
+        os._exit(0)
+
+# === MAIN APPLICATION ===
+def main():
+    profile = StartupProfile(STARTUP_TIME, '--startup-profile' in sys.argv)
+    profile.mark('imports')
+
+    # A panel that is already running on its own is raised and left alone
+    names = [name for name in PANEL_TITLES if not send_command(name, 'show')]
+    if not os.path.exists(os.path.join(NUMPAD_DIR, 'numpad_palette.py')):
+        names = [name for name in names if name != 'numpad_palette']
+    if not names:
+        print("Keypads are already running")
+        return
+
+    from floating_keypad import FloatingKeyboard, check_dependencies
+    check_dependencies()
+    profile.mark('dependency check')
+
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication(sys.argv)
+    # Sets WM_CLASS, so other keypad processes can tell this one's windows apart
+    app.setApplicationName('keypad_host')
+    profile.mark('QApplication')
+
+    app.setQuitOnLastWindowClosed(False)
+
+    host = KeypadHost(profile)
+    if 'floating_keypad' in names:
+        # Only the first panel reports startup, or it would be reported twice
+        keypad = FloatingKeyboard(profile, host)
+        host.add_panel('floating_keypad', keypad)
+        profile = None
+    if 'numpad_palette' in names:
+        # Appended, so the shared keypad_* modules still load from this directory
+        sys.path.append(NUMPAD_DIR)
+        from numpad_palette import NumpadPalette
+        palette = NumpadPalette(profile, host)
+        host.add_panel('numpad_palette', palette)
+    host.setup_tray_icon()
+    for panel in host.panels.values():
+        panel.show()
+
+    print(f"Keypad host started: {', '.join(PANEL_TITLES[name] for name in host.panels)}")
+
+    signal.signal(signal.SIGINT, lambda *args: host.close_application())
+
+    sys.exit(app.exec_())
+
+if __name__ == "__main__":
+    main()
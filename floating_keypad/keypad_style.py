@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Application-level stylesheet and rendering shared by the keypads.
+
+Buttons carry their look in dynamic properties (keyColor, active, compact)
+and one stylesheet on the QApplication holds a rule for every color in use.
+Changing a button's color or toggle state only flips a property and
+re-polishes that button; the stylesheet is re-parsed only when a color is
+seen for the first time.
+
+Panels render in one of RENDER_MODES (the render_mode setting) and are
+dragged through a DragMover, which moves the window at most once per
+display frame however fast the pointer reports.
+
+Shared with numpad_palette/; see SHARED_MODULES in benchmarks/backend_check.py.
+"""
+
+import functools
+import re
+
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QColor, QPainter, QPixmap
+from PyQt5.QtWidgets import QApplication
+
+DEFAULT_COLOR = '#4a90e2'
+ACTIVE_COLOR = '#ff8800'
+ACTIVE_BORDER = '#ffaa00'
+
+# translucent - composited rgba backdrop painted by the stylesheet
+# opaque      - no alpha channel, so the compositor never blends the panel
+# cached      - translucent, with the backdrop painted from one cached pixmap
+RENDER_MODES = ('translucent', 'opaque', 'cached')
+PANEL_ALPHA = 120
+OPAQUE_BACKGROUND = '#2b2b2b'
+
+# Hand-tuned shades of the stock colors; anything else is computed
+TUNED_SHADES = {
+    '#4a90e2': ('#5ba0f2', '#3a80d2'),
+    '#ff4444': ('#ff6666', '#dd2222'),
+    '#44aa44': ('#66cc66', '#228822'),
+    '#4aa444': ('#6cc466', '#2a8a24'),
+    '#ff8800': ('#ffaa00', '#cc6600'),
+    '#888888': ('#aaaaaa', '#666666'),
+}
+
+PANEL_RULES = """
+QWidget[keypadPanel="true"], QWidget[keypadPanel="true"] QWidget {
+    background-color: rgba(0, 0, 0, 120);
+    border-radius: 10px;
+}
+QLabel[keypadTitle="true"] {
+    color: white;
+    font-weight: bold;
+    font-size: 12px;
+}
+QWidget[keypadPanel="true"] QPushButton {
+    color: white;
+    border: 1px solid #333;
+    border-radius: 5px;
+    font-size: 10px;
+    font-weight: bold;
+}
+QWidget[keypadPanel="true"] QPushButton[compact="true"] {
+    font-size: 9px;
+}
+"""
+
+# After the panel rules and before the color rules, so buttons keep their
+# colors while the containers stop painting a backdrop of their own
+RENDER_RULES = f"""
+QWidget[keypadRender="opaque"] {{
+    background-color: {OPAQUE_BACKGROUND};
+    border-radius: 0px;
+}}
+QWidget[keypadRender="opaque"] QWidget, QWidget[keypadRender="cached"],
+QWidget[keypadRender="cached"] QWidget {{
+    background-color: transparent;
+}}
+"""
+
+COLOR_RULES = """
+QWidget[keypadPanel="true"] QPushButton[keyColor="{color}"] {{
+    background-color: {color};
+}}
+QWidget[keypadPanel="true"] QPushButton[keyColor="{color}"]:hover {{
+    background-color: {light};
+}}
+QWidget[keypadPanel="true"] QPushButton[keyColor="{color}"]:pressed {{
+    background-color: {dark};
+}}
+"""
+
+# Kept after the color rules so they win at equal specificity
+ACTIVE_RULES = f"""
+QWidget[keypadPanel="true"] QPushButton[active="true"] {{
+    background-color: {ACTIVE_COLOR};
+    border: 2px solid {ACTIVE_BORDER};
+}}
+QWidget[keypadPanel="true"] QPushButton[active="true"]:hover {{
+    background-color: {ACTIVE_BORDER};
+}}
+QWidget[keypadPanel="true"] QPushButton[active="true"]:pressed {{
+    background-color: {ACTIVE_COLOR};
+}}
+"""
+
+_colors = []
+_backdrops = {}
+
+
+# === COLOR UTILITIES ===
+RGB_PATTERN = re.compile(r'rgba?\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*(?:,[^)]*)?\)')
+
+
+@functools.lru_cache(maxsize=None)
+def normalize_color(color):
+    """Return '#rrggbb' for a hex color, a CSS/SVG color name such as 'red',
+    or 'rgb(r, g, b)'; None if it is none of these. Alpha is dropped."""
+    color = str(color).strip().lower()
+    if len(color) == 4 and color.startswith('#'):
+        color = '#' + ''.join(c * 2 for c in color[1:])
+    try:
+        if len(color) == 7 and color.startswith('#'):
+            int(color[1:], 16)
+            return color
+    except ValueError:
+        pass
+    match = RGB_PATTERN.fullmatch(color)
+    if match:
+        return '#' + ''.join(f"{min(255, int(c)):02x}" for c in match.groups())
+    qcolor = QColor(color)
+    if qcolor.isValid():
+        return qcolor.name()
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def button_color(color):
+    """normalize_color(color), or DEFAULT_COLOR with a warning printed once"""
+    normalized = normalize_color(color)
+    if normalized is None:
+        print(f"Unknown color {color}, using {DEFAULT_COLOR}")
+        return DEFAULT_COLOR
+    return normalized
+
+
+@functools.lru_cache(maxsize=None)
+def shade_color(color, amount):
+    """Move each channel towards white (amount > 0) or black (amount < 0)"""
+    channels = [int(color[i:i + 2], 16) for i in (1, 3, 5)]
+    if amount > 0:
+        channels = [c + (255 - c) * amount for c in channels]
+    else:
+        channels = [c * (1 + amount) for c in channels]
+    return '#' + ''.join(f"{round(c):02x}" for c in channels)
+
+
+def lighten_color(color):
+    if color in TUNED_SHADES:
+        return TUNED_SHADES[color][0]
+    return shade_color(color, 0.2)
+
+
+def darken_color(color):
+    if color in TUNED_SHADES:
+        return TUNED_SHADES[color][1]
+    return shade_color(color, -0.2)
+
+
+# === STYLESHEET ===
+def build_stylesheet(colors):
+    rules = [PANEL_RULES, RENDER_RULES]
+    for color in colors:
+        rules.append(COLOR_RULES.format(color=color, light=lighten_color(color),
+                                        dark=darken_color(color)))
+    rules.append(ACTIVE_RULES)
+    return ''.join(rules)
+
+
+def register_colors(colors):
+    """Make sure every color has rules; re-parse the stylesheet only if needed"""
+    new_colors = []
+    for color in colors:
+        color = normalize_color(color)
+        if color and color not in _colors and color not in new_colors:
+            new_colors.append(color)
+    app = QApplication.instance()
+    if not new_colors and app.property('keypadStyled'):
+        return
+    _colors.extend(new_colors)
+    app.setStyleSheet(build_stylesheet(_colors))
+    app.setProperty('keypadStyled', True)
+
+
+def repolish(widget):
+    widget.style().unpolish(widget)
+    widget.style().polish(widget)
+
+
+# === WIDGET PROPERTIES ===
+def style_panel(widget, title=None, render_mode='translucent'):
+    """Style a top-level panel; call before it is first shown"""
+    if render_mode not in RENDER_MODES:
+        print(f"Unknown render_mode {render_mode}, using translucent")
+        render_mode = 'translucent'
+    widget.setAttribute(Qt.WA_TranslucentBackground, render_mode != 'opaque')
+    widget.setProperty('keypadPanel', True)
+    widget.setProperty('keypadRender', render_mode)
+    if title is not None:
+        title.setProperty('keypadTitle', True)
+    register_colors([DEFAULT_COLOR])
+
+
+def set_button_color(button, color, compact=None):
+    color = button_color(color)
+    register_colors([color])
+    if compact is not None:
+        button.setProperty('compact', compact)
+    if button.property('keyColor') != color:
+        button.setProperty('keyColor', color)
+        repolish(button)
+
+
+def set_button_active(button, active):
+    if bool(button.property('active')) != active:
+        button.setProperty('active', active)
+        repolish(button)
+
+
+# === RENDERING ===
+def paint_backdrop(widget):
+    """Draw the cached render mode's backdrop; a no-op in the other modes"""
+    if widget.property('keypadRender') != 'cached':
+        return
+    size = (widget.width(), widget.height())
+    backdrop = _backdrops.get(size)
+    if backdrop is None:
+        backdrop = QPixmap(*size)
+        backdrop.fill(Qt.transparent)
+        painter = QPainter(backdrop)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(0, 0, 0, PANEL_ALPHA))
+        painter.drawRoundedRect(backdrop.rect(), 10, 10)
+        painter.end()
+        _backdrops[size] = backdrop
+    painter = QPainter(widget)
+    painter.drawPixmap(0, 0, backdrop)
+    painter.end()
+
+
+class DragMover:
+    """Move a window at most once per display frame while it is dragged.
+
+    A stylus reports at 200 Hz and more; every move of a translucent window
+    costs a composited repaint. The first move of a drag is applied at once,
+    later ones only record the position, and a frame timer applies the
+    latest one. moves and events count both sides for benchmarks.
+    """
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.position = None
+        self.moves = 0
+        self.events = 0
+        self.timer = QTimer(widget)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.next_frame)
+
+    def frame_interval(self):
+        window = self.widget.windowHandle()
+        screen = window.screen() if window else QApplication.primaryScreen()
+        rate = screen.refreshRate() if screen else 0
+        return max(1, round(1000 / (rate or 60)))
+
+    def move(self, position):
+        self.events += 1
+        self.position = position
+        if not self.timer.isActive():
+            self.apply()
+            self.timer.start(self.frame_interval())
+
+    def next_frame(self):
+        if self.position is not None:
+            self.apply()
+            self.timer.start(self.frame_interval())
+
+    def apply(self):
+        self.widget.move(self.position)
+        self.position = None
+        self.moves += 1
+
+    def finish(self):
+        """Land on the last pointer position when the button is released"""
+        self.timer.stop()
+        if self.position is not None:
+            self.apply()
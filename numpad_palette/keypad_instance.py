@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Single-instance control socket shared by the keypads and their launchers.
+
+The launchers import this module before anything heavy, so it must not
+import PyQt5 at module level.
+
+Shared with numpad_palette/; see SHARED_MODULES in benchmarks/backend_check.py.
+"""
+
+import os
+import socket
+import tempfile
+
+
+def socket_path(name):
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(runtime_dir, f"inkscape-{name}-{os.getuid()}.sock")
+
+
+def send_command(name, command, timeout=0.5):
+    """Send one command to a running instance; return its reply or None"""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(socket_path(name))
+        client.sendall(command.encode('utf-8') + b'\n')
+        reply = client.recv(256).decode('utf-8', 'replace').strip()
+        return reply or None
+    except OSError:
+        return None
+    finally:
+        client.close()
+
+
+def start_server(name, handle_command, parent=None):
+    """Answer launcher commands on a QLocalServer in the Qt event loop.
+
+    handle_command(command) runs on the GUI thread and returns the reply
+    line. Call this only after send_command() found no running instance;
+    a stale socket file left by a crashed instance is replaced.
+    """
+    from PyQt5.QtNetwork import QLocalServer
+
+    server = QLocalServer(parent)
+    path = socket_path(name)
+    QLocalServer.removeServer(path)
+    if not server.listen(path):
+        print(f"Instance socket unavailable: {server.errorString()}")
+        return None
+
+    def read_commands(connection):
+        while connection.canReadLine():
+            command = bytes(connection.readLine()).decode('utf-8', 'replace').strip()
+            reply = handle_command(command)
+            connection.write(f"{reply}\n".encode('utf-8'))
+        connection.flush()
+
+    def accept_connections():
+        while server.hasPendingConnections():
+            connection = server.nextPendingConnection()
+            connection.readyRead.connect(lambda c=connection: read_commands(c))
+            connection.disconnected.connect(connection.deleteLater)
+
+    server.newConnection.connect(accept_connections)
+    return server
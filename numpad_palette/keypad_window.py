@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Event-driven Inkscape window tracking shared by both keypads.
+
+Shared with numpad_palette/; see SHARED_MODULES in benchmarks/backend_check.py.
+"""
+
+INKSCAPE_CLASSES = ('inkscape', 'org.inkscape.inkscape')
+# Application names the keypads set, which Qt puts in their WM_CLASS
+KEYPAD_CLASSES = ('floating_keypad', 'numpad_palette', 'keypad_host')
+
+
+def format_window_id(window_id):
+    # Same format as `wmctrl -l` so ids can be passed straight to wmctrl
+    return f"0x{window_id:08x}"
+
+
+def is_inkscape_class(wm_class):
+    return bool(wm_class) and any(part.lower() in INKSCAPE_CLASSES for part in wm_class)
+
+
+def is_keypad_class(wm_class):
+    return bool(wm_class) and any(part.lower() in KEYPAD_CLASSES for part in wm_class)
+
+
+DOCK_ANCHORS = ('top-left', 'top', 'top-right', 'left', 'right',
+                'bottom-left', 'bottom', 'bottom-right')
+
+
+def dock_position(anchor, geometry, size, margin=10, offset=0):
+    """Return (x, y) that puts a panel of size (width, height) at anchor
+    inside geometry (x, y, width, height). offset shifts it towards the
+    window's middle, so several panels can share one anchor."""
+    x, y, width, height = geometry
+    panel_width, panel_height = size
+    if 'left' in anchor:
+        left = x + margin + offset
+    elif 'right' in anchor:
+        left = x + width - panel_width - margin - offset
+    else:
+        left = x + (width - panel_width) // 2 + offset
+    if anchor.startswith('top'):
+        top = y + margin
+    elif anchor.startswith('bottom'):
+        top = y + height - panel_height - margin
+    else:
+        top = y + (height - panel_height) // 2
+    return left, top
+
+
+class WindowTracker:
+    """Keep the Inkscape window id current from X events.
+
+    The client list is read from _NET_CLIENT_LIST on the root window and
+    WM_CLASS is looked up once per new client, so a rescan after the first
+    one only queries windows that appeared since. Root PropertyNotify and
+    the tracked window's DestroyNotify trigger rescans; nothing is polled.
+
+    With several Inkscape windows open, the tracked one is the one most
+    recently made active: every _NET_ACTIVE_WINDOW change that names an
+    Inkscape window moves it to the front of the recent list.
+
+    The tracker does not start a thread. The owner watches fileno() (for
+    example with a QSocketNotifier) and calls process_events() when it is
+    readable; on_change(window_id, geometry) is then called on that thread.
+    When the tracked window is moved or resized, its ConfigureNotify events
+    call on_move(window_id, geometry), once per batch of events.
+    on_focus(focused) is called when the active window changes between an
+    Inkscape window and anything else; windows in `ignored` (the panels
+    themselves) and any keypad window, including one of another keypad
+    process, leave the state as it is.
+    """
+
+    def __init__(self, on_change, on_move=None, on_focus=None):
+        from Xlib import X, display
+        self.X = X
+        self.on_change = on_change
+        self.on_move = on_move
+        self.on_focus = on_focus
+        self.ignored = set()
+        self.inkscape_focused = None
+        self.display = display.Display()
+        self.display.set_error_handler(self.ignore_error)
+        self.root = self.display.screen().root
+        self.client_list_atom = self.display.intern_atom('_NET_CLIENT_LIST')
+        self.active_atom = self.display.intern_atom('_NET_ACTIVE_WINDOW')
+        self.class_cache = {}
+        self.recent = []
+        self.window_id = None
+        self.tracked_window = None
+        self.tracked_geometry = None
+        self.root.change_attributes(event_mask=X.PropertyChangeMask)
+        self.display.flush()
+
+    def ignore_error(self, error, request):
+        # Windows can vanish between the client list read and a follow-up
+        # request; the DestroyNotify that follows triggers a rescan anyway.
+        pass
+
+    def fileno(self):
+        return self.display.fileno()
+
+    def read_client_list(self):
+        prop = self.root.get_full_property(self.client_list_atom, self.X.AnyPropertyType)
+        return list(prop.value) if prop else []
+
+    def read_active(self):
+        prop = self.root.get_full_property(self.active_atom, self.X.AnyPropertyType)
+        return int(prop.value[0]) if prop and len(prop.value) else None
+
+    def read_class(self, window_id):
+        try:
+            window = self.display.create_resource_object('window', window_id)
+            return window.get_wm_class()
+        except Exception:
+            return None
+
+    def refresh(self):
+        """Rescan the client list and report a change of Inkscape window"""
+        clients = self.read_client_list()
+        for window_id in clients:
+            if window_id not in self.class_cache:
+                self.class_cache[window_id] = self.read_class(window_id)
+        for window_id in list(self.class_cache):
+            if window_id not in clients:
+                del self.class_cache[window_id]
+
+        # Keep the recent order, add new windows last, drop closed ones
+        matches = [w for w in clients if is_inkscape_class(self.class_cache[w])]
+        self.recent = ([w for w in self.recent if w in matches] +
+                       [w for w in matches if w not in self.recent])
+        self.active_changed()
+        self.set_window(self.recent[0] if self.recent else None)
+
+    def active_changed(self):
+        """Move the active window to the front if it is an Inkscape window"""
+        window_id = self.read_active()
+        if window_id in self.recent and self.recent[0] != window_id:
+            self.recent.remove(window_id)
+            self.recent.insert(0, window_id)
+            self.set_window(window_id)
+        if self.on_focus and not self.is_panel(window_id):
+            focused = window_id in self.recent
+            if focused != self.inkscape_focused:
+                self.inkscape_focused = focused
+                self.on_focus(focused)
+
+    def is_panel(self, window_id):
+        if window_id in self.ignored:
+            return True
+        if window_id is not None and window_id not in self.class_cache:
+            # Tool windows may be missing from the client list; dropped on the next rescan
+            self.class_cache[window_id] = self.read_class(window_id)
+        return is_keypad_class(self.class_cache.get(window_id))
+
+    def set_window(self, window_id):
+        if window_id == self.window_id:
+            return
+        self.window_id = window_id
+        self.tracked_window = None
+        geometry = None
+        if window_id is not None:
+            self.tracked_window = self.display.create_resource_object('window', window_id)
+            self.tracked_window.change_attributes(event_mask=self.X.StructureNotifyMask)
+            geometry = self.geometry(self.tracked_window)
+        self.tracked_geometry = geometry
+        self.display.flush()
+        self.on_change(format_window_id(window_id) if window_id else None, geometry)
+
+    def geometry(self, window):
+        """Return (x, y, width, height) in root coordinates, or None"""
+        try:
+            geom = window.get_geometry()
+            origin = self.root.translate_coords(window, 0, 0)
+            return (origin.x, origin.y, geom.width, geom.height)
+        except Exception:
+            return None
+
+    def process_events(self, *args):
+        moved = False
+        while self.display.pending_events():
+            event = self.display.next_event()
+            if event.type == self.X.PropertyNotify:
+                if event.atom == self.client_list_atom:
+                    self.refresh()
+                elif event.atom == self.active_atom:
+                    self.active_changed()
+            elif event.type == self.X.DestroyNotify:
+                if event.window.id == self.window_id:
+                    self.refresh()
+            elif event.type == self.X.ConfigureNotify:
+                # Real and synthetic (WM move) events carry coordinates in
+                # different frames, so the position is read back below
+                moved = moved or event.window.id == self.window_id
+        if moved and self.on_move and self.tracked_window:
+            self.window_moved()
+
+    def window_moved(self):
+        geometry = self.geometry(self.tracked_window)
+        if geometry and geometry != self.tracked_geometry:
+            self.tracked_geometry = geometry
+            self.on_move(format_window_id(self.window_id), geometry)
+
+    def close(self):
+        try:
+            self.display.close()
+        except Exception:
+            pass
@@ -3,33 +3,95 @@
 
 import sys
 import time
+STARTUP_TIME = time.perf_counter()
 import subprocess
 import os
 import signal
-import yaml
 from PyQt5.QtWidgets import (QApplication, QWidget, QPushButton, QVBoxLayout, 
-                             QHBoxLayout, QLabel, QSystemTrayIcon, QMenu, QGridLayout)
-from PyQt5.QtCore import Qt, QTimer
+                             QHBoxLayout, QLabel, QSystemTrayIcon, QMenu, QGridLayout,
+                             QStackedWidget)
+from PyQt5.QtCore import Qt, QTimer, QSocketNotifier, pyqtSignal, QFileSystemWatcher, QEvent
 from PyQt5.QtGui import QIcon, QPixmap
-import pyautogui
+from keypad_backends import (KeyDispatcher, KeyInjector, LatencyStats, PressTrace,
+                             StartupProfile, format_keys, load_yaml,
+                             merge_settings, probe_tools)
+from keypad_instance import send_command, start_server
+from keypad_style import (DragMover, paint_backdrop, register_colors, set_button_active,
+                          set_button_color, style_panel)
+from keypad_window import DOCK_ANCHORS, WindowTracker, dock_position, is_inkscape_class
+
+# Top-level config blocks that are not key settings
+CONFIG_SECTIONS = ('settings', 'layout', 'layers')
+
+# Grid used when numpad_config.yaml has no layout block
+DEFAULT_LAYOUT = {
+    'button_size': [45, 40],
+    'spacing': 10,
+    'buttons': [
+        {'id': '7', 'row': 0, 'column': 0}, {'id': '8', 'row': 0, 'column': 1},
+        {'id': '9', 'row': 0, 'column': 2},
+        {'id': '4', 'row': 1, 'column': 0}, {'id': '5', 'row': 1, 'column': 1},
+        {'id': '6', 'row': 1, 'column': 2},
+        {'id': '1', 'row': 2, 'column': 0}, {'id': '2', 'row': 2, 'column': 1},
+        {'id': '3', 'row': 2, 'column': 2},
+        {'id': '0', 'row': 3, 'column': 0},
+        {'id': 'return', 'row': 3, 'column': 1, 'column_span': 2, 'size': [100, 40]},
+        {'id': 'backspace', 'row': 4, 'column': 0}, {'id': 'delete', 'row': 4, 'column': 1},
+        {'id': 'count', 'row': 4, 'column': 2},
+    ],
+}
+
+# Count mode toggle used when the config does not define the 'count' key
+DEFAULT_COUNT_KEY = {'label': '×N', 'count': True, 'color': '#888888'}
+
+# Digits a count can have, so a stray tap cannot queue thousands of presses
+MAX_COUNT_DIGITS = 3
 
 class NumpadPalette(QWidget):
-    def __init__(self):
+    # Emitted from the dispatch thread; delivered on the GUI thread
+    latency_recorded = pyqtSignal()
+    
+    def __init__(self, startup_profile=None, host=None):
         super().__init__()
+        self.startup_profile = startup_profile or StartupProfile(0, enabled=False)
+        # A KeypadHost shares its settings, backends and window tracker
+        self.host = host
+        self.first_paint_done = False
         self.inkscape_window_id = None
+        self.window_tracker = None
+        self.auto_hidden = False
         self.collapsed = False
-        self.normal_height = 280
         self.collapsed_height = 40
-        self.shortcut_mode = False
+        self.current_layer = 'NUM'
+        # Count mode: NUM digits build a count for the next shortcut press
+        self.count_mode = False
+        self.pending_count = ''
         self.key_mappings = {}
+        self.config_file = os.path.join(os.path.dirname(__file__), "numpad_config.yaml")
+        self.config_watcher = None
         self.load_key_mappings()
+        self.startup_profile.mark('load config')
+        if host:
+            self.injector = host.injector
+            self.dispatcher = host.dispatcher.channel(self.deliver_key)
+            self.latency = host.latency
+        else:
+            self.injector = KeyInjector(self.settings)
+            print(f"Key backends: {self.injector.report()}")
+            self.dispatcher = KeyDispatcher(self.deliver_key, self.settings)
+            self.latency = LatencyStats(self.settings)
+            self.startup_profile.mark('key backends')
         self.init_ui()
         self.setup_window()
-        self.setup_tray_icon()
-        self.find_inkscape_window()
+        self.startup_profile.mark('build ui')
+        self.instance_server = None
+        if not host:
+            self.setup_tray_icon()
+            self.instance_server = start_server('numpad_palette', self.handle_instance_command, self)
+            self.startup_profile.mark('tray and socket')
     
     def load_key_mappings(self):
-        config_file = os.path.join(os.path.dirname(__file__), "numpad_config.yaml")
+        config_file = self.config_file
         default_config = {
             '7': {'label': '7', 'key': '7', 'color': '#4a90e2'},
             '8': {'label': '8', 'key': '8', 'color': '#4a90e2'},
@@ -43,13 +105,13 @@ class NumpadPalette(QWidget):
             '0': {'label': '0', 'key': '0', 'color': '#4a90e2'},
             'return': {'label': 'Enter', 'key': 'Return', 'color': '#44aa44'},
             'backspace': {'label': 'BS', 'key': 'BackSpace', 'color': '#ff8800'},
-            'delete': {'label': 'Del', 'key': 'Delete', 'color': '#ff8800'}
+            'delete': {'label': 'Del', 'key': 'Delete', 'color': '#ff8800'},
+            'count': dict(DEFAULT_COUNT_KEY)
         }
         
         try:
             if os.path.exists(config_file):
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    self.key_mappings = yaml.safe_load(f)
+                self.key_mappings = load_yaml(config_file, validate=validate_config, schema=7)
                 print(f"Loaded config from {config_file}")
             else:
                 self.key_mappings = default_config
@@ -57,10 +119,35 @@ class NumpadPalette(QWidget):
                 print(f"Created default config at {config_file}")
         except Exception as e:
             print(f"Error loading config: {e}")
-            self.key_mappings = default_config
+            # Keep the current mappings when a reload hits a half-saved file
+            if not self.key_mappings:
+                self.key_mappings = default_config
+        
+        if self.host:
+            # The host's settings apply to every panel it runs
+            self.settings = self.host.settings
+        else:
+            self.settings = merge_settings(self.key_mappings.get('settings'))
+        self.resolve_layers()
+    
+    def resolve_layers(self):
+        """Build the key settings of every shortcut layer.
+        
+        NUM is the built-in numpad, SC holds the top-level key settings and
+        each entry of the layers block adds a named layer. Keys a named
+        layer does not define fall back to SC.
+        """
+        shortcuts = {key_id: mapping for key_id, mapping in self.key_mappings.items()
+                     if key_id not in CONFIG_SECTIONS}
+        shortcuts.setdefault('count', DEFAULT_COUNT_KEY)
+        self.layer_mappings = {'NUM': {}, 'SC': shortcuts}
+        for name, mappings in self.key_mappings.get('layers', {}).items():
+            self.layer_mappings[name] = dict(shortcuts, **mappings)
+        self.layer_names = list(self.layer_mappings)
     
     def save_default_config(self, config_file):
         try:
+            import yaml
             with open(config_file, 'w', encoding='utf-8') as f:
                 yaml.dump(self.key_mappings, f, default_flow_style=False, 
                          allow_unicode=True, indent=2)
@@ -87,10 +174,15 @@ class NumpadPalette(QWidget):
             quit_action.triggered.connect(self.close_application)
             self.tray_icon.setContextMenu(tray_menu)
             self.tray_icon.activated.connect(self.tray_icon_activated)
+            self.tray_icon.setToolTip("Numpad Palette")
+            self.latency_recorded.connect(self.update_latency_tooltip)
             self.tray_icon.show()
         except:
             pass
     
+    def update_latency_tooltip(self):
+        self.tray_icon.setToolTip(f"Numpad Palette\n{self.latency.summary()}")
+    
     def tray_icon_activated(self, reason):
         if reason == QSystemTrayIcon.Trigger:
             if self.isVisible():
@@ -98,36 +190,132 @@ class NumpadPalette(QWidget):
             else:
                 self.show()
     
+    def start_config_watcher(self):
+        if not self.settings['auto_reload']:
+            return
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(300)
+        self.reload_timer.timeout.connect(self.reload_config)
+        self.config_watcher = QFileSystemWatcher(self)
+        self.config_watcher.fileChanged.connect(self.config_file_changed)
+        self.watch_config_file()
+    
+    def watch_config_file(self):
+        # Editors that save by renaming drop the watch, so it is re-added
+        if (self.config_watcher and os.path.exists(self.config_file) and
+                self.config_file not in self.config_watcher.files()):
+            self.config_watcher.addPath(self.config_file)
+    
+    def config_file_changed(self, path):
+        # Editors write in several steps; reload once they are done
+        self.reload_timer.start()
+    
     def reload_config(self):
         print("Reloading configuration...")
-        mode_state = self.shortcut_mode
+        self.watch_config_file()
+        old_layers = self.layer_mappings
+        old_settings = self.settings
         self.load_key_mappings()
-        self.recreate_ui()
-        self.shortcut_mode = mode_state
-        if hasattr(self, 'mode_btn'):
-            self.update_mode_button_style()
+        self.injector.configure(self.settings)
+        self.dispatcher.configure(self.settings)
+        self.latency.configure(self.settings)
+        
+        if (self.key_mappings.get('layout', DEFAULT_LAYOUT) != self.layout_spec or
+                self.layer_names != list(old_layers)):
+            self.build_layer_pages()
+            print("Reloaded config, layers rebuilt")
+            return
+        if any(old_settings[name] != self.settings[name]
+               for name in ('repeat_keys', 'repeat_delay', 'repeat_rate')):
             self.update_all_buttons()
+            print("Reloaded config, auto-repeat updated")
+            return
+        
+        # Keep the widgets and only patch the buttons whose mapping changed;
+        # bound keys are looked up at press time so they need no patching
+        changed = 0
+        for layer, buttons in self.layer_buttons.items():
+            old_mappings = old_layers[layer]
+            mappings = self.layer_mappings[layer]
+            key_ids = [key_id for key_id in buttons
+                       if old_mappings.get(key_id) != mappings.get(key_id)]
+            register_colors(self.get_button_color(key_id, layer) for key_id in key_ids)
+            self.update_buttons(layer, key_ids)
+            changed += len(key_ids)
+        print(f"Reloaded config, {changed} button(s) changed")
+    
+    def paintEvent(self, event):
+        paint_backdrop(self)
+        super().paintEvent(event)
+        if not self.first_paint_done:
+            self.first_paint_done = True
+            self.startup_profile.mark('first paint')
+            # Window search waits until the keypad is on screen
+            QTimer.singleShot(0, self.finish_startup)
+    
+    def finish_startup(self):
+        self.start_window_tracker()
+        self.startup_profile.mark('window search')
+        self.start_config_watcher()
+        self.startup_profile.mark('config watcher')
+        self.startup_profile.report()
+    
+    def start_window_tracker(self):
+        try:
+            if self.host:
+                self.window_tracker = self.host.watch_window(self)
+                return
+            self.window_tracker = WindowTracker(self.set_inkscape_window, self.inkscape_moved,
+                                                self.inkscape_focused)
+            self.window_tracker.ignored.add(int(self.winId()))
+            self.tracker_notifier = QSocketNotifier(self.window_tracker.fileno(),
+                                                    QSocketNotifier.Read, self)
+            self.tracker_notifier.activated.connect(self.window_tracker.process_events)
+            self.window_tracker.refresh()
+        except Exception as e:
+            print(f"Window tracker unavailable, using wmctrl: {e}")
+            self.window_tracker = None
+            self.find_inkscape_window()
+    
+    def set_inkscape_window(self, window_id, geometry):
+        first_window = self.inkscape_window_id is None
+        self.inkscape_window_id = window_id
+        if not window_id:
+            print("Inkscape window closed")
+            return
+        if self.dock(geometry):
+            print(f"Found Inkscape window: {window_id}, palette docked")
+            return
+        # Switching between documents must not move the palette around
+        if geometry and first_window:
+            print(f"Found Inkscape window: {window_id} at ({geometry[0]}, {geometry[1]})")
+            self.position_on_inkscape_screen(geometry[0], geometry[1])
+        else:
+            print(f"Found Inkscape window: {window_id}")
     
     def find_inkscape_window(self):
+        if self.window_tracker:
+            self.window_tracker.refresh()
+            self.window_tracker.process_events()
+            return
+        
         try:
-            result = subprocess.run(['wmctrl', '-lG'], capture_output=True, text=True)
+            # id, desktop, x, y, width, height, class, host, title; match the
+            # class only, since any title can contain "Inkscape"
+            result = subprocess.run(['wmctrl', '-lxG'], capture_output=True, text=True)
             for line in result.stdout.split('\n'):
-                if 'inkscape.Inkscape' in line or 'org.inkscape.Inkscape' in line or 'Inkscape' in line:
-                    parts = line.split()
-                    if len(parts) >= 6:
-                        self.inkscape_window_id = parts[0]
-                        inkscape_x = int(parts[2])
-                        inkscape_y = int(parts[3])
-                        print(f"Found Inkscape window: {self.inkscape_window_id} at ({inkscape_x}, {inkscape_y})")
+                parts = line.split()
+                if len(parts) >= 7 and is_inkscape_class(parts[6].split('.')):
+                    self.inkscape_window_id = parts[0]
+                    inkscape_x = int(parts[2])
+                    inkscape_y = int(parts[3])
+                    print(f"Found Inkscape window: {self.inkscape_window_id} at ({inkscape_x}, {inkscape_y})")
+                    # Docked once here; following moves needs the window tracker
+                    geometry = (inkscape_x, inkscape_y, int(parts[4]), int(parts[5]))
+                    if not self.dock(geometry):
                         self.position_on_inkscape_screen(inkscape_x, inkscape_y)
-                        return
-            
-            result = subprocess.run(['wmctrl', '-lx'], capture_output=True, text=True)
-            for line in result.stdout.split('\n'):
-                if 'inkscape.Inkscape' in line or 'org.inkscape.Inkscape' in line:
-                    self.inkscape_window_id = line.split()[0]
-                    print(f"Found Inkscape window: {self.inkscape_window_id}")
-                    break
+                    return
                     
             if not self.inkscape_window_id:
                 try:
@@ -143,6 +331,39 @@ class NumpadPalette(QWidget):
             print(f"Window search error: {e}")
             print("Please ensure wmctrl is installed: sudo apt install wmctrl")
     
+    def dock(self, geometry):
+        """Move to the dock anchor of the Inkscape window; False if not docking"""
+        anchor = self.settings['dock']
+        if anchor not in DOCK_ANCHORS or not geometry:
+            return False
+        # Panels of one host share the anchor side by side
+        offset = self.host.right_margin(self) - 50 if self.host else 0
+        self.move(*dock_position(anchor, geometry, (self.width(), self.height()),
+                                 int(self.settings['dock_margin']), offset))
+        return True
+    
+    def inkscape_moved(self, window_id, geometry):
+        self.dock(geometry)
+    
+    def inkscape_focused(self, focused):
+        """Hide or fade the panel while another application is active"""
+        mode = self.settings['auto_hide']
+        if mode not in ('hide', 'fade'):
+            return
+        self.dispatcher.suspend(not focused)
+        if mode == 'fade':
+            # A faded panel keeps its last frame and ignores clicks
+            self.setUpdatesEnabled(focused)
+            self.setAttribute(Qt.WA_TransparentForMouseEvents, not focused)
+            self.setWindowOpacity(1.0 if focused else float(self.settings['fade_opacity']))
+        elif not focused and self.isVisible():
+            self.auto_hidden = True
+            self.hide()
+        elif focused and self.auto_hidden:
+            # Only panels hidden here come back; the tray's Hide sticks
+            self.auto_hidden = False
+            self.show()
+    
     def position_on_inkscape_screen(self, inkscape_x, inkscape_y):
         app = QApplication.instance()
         desktop = app.desktop()
@@ -153,7 +374,7 @@ class NumpadPalette(QWidget):
             if (screen_geo.x() <= inkscape_x < screen_geo.x() + screen_geo.width() and
                 screen_geo.y() <= inkscape_y < screen_geo.y() + screen_geo.height()):
                 # Position palette on this screen's right edge
-                palette_x = screen_geo.x() + screen_geo.width() - self.width() - 50
+                palette_x = screen_geo.x() + screen_geo.width() - self.width() - self.right_margin()
                 palette_y = screen_geo.y() + 50
                 self.move(palette_x, palette_y)
                 print(f"Positioned palette on screen {i} at ({palette_x}, {palette_y})")
@@ -161,11 +382,18 @@ class NumpadPalette(QWidget):
         
         # Fallback to primary screen
         screen = desktop.screenGeometry()
-        self.move(screen.width() - self.width() - 50, 50)
-    
-    def get_button_label(self, key_id):
-        if self.shortcut_mode:
-            return self.key_mappings.get(key_id, {}).get('label', key_id)[:5]
+        self.move(screen.width() - self.width() - self.right_margin(), 50)
+    
+    def right_margin(self):
+        # Panels of one host sit side by side instead of on top of each other
+        return self.host.right_margin(self) if self.host else 50
+    
+    def get_button_label(self, key_id, layer):
+        if self.get_button_count(key_id, layer) and self.pending_count:
+            return f"×{self.pending_count}"
+        if layer != 'NUM':
+            mapping = self.layer_mappings[layer].get(key_id, {})
+            return mapping.get('label', key_id)[:5]
         else:
             if key_id == 'return':
                 return 'Enter'
@@ -173,11 +401,16 @@ class NumpadPalette(QWidget):
                 return 'BS'
             elif key_id == 'delete':
                 return 'Del'
+            elif key_id == 'count':
+                return DEFAULT_COUNT_KEY['label']
             return key_id
     
-    def get_button_key(self, key_id):
-        if self.shortcut_mode:
-            return self.key_mappings.get(key_id, {}).get('key', key_id)
+    def get_button_key(self, key_id, layer):
+        if layer != 'NUM':
+            mapping = self.layer_mappings[layer].get(key_id, {})
+            if 'action' in mapping and not ('key' in mapping or 'keys' in mapping):
+                return None
+            return mapping.get('keys', mapping.get('key', key_id))
         else:
             if key_id == 'return':
                 return 'Return'
@@ -187,24 +420,53 @@ class NumpadPalette(QWidget):
                 return 'Delete'
             return key_id
     
-    def get_button_color(self, key_id):
-        if self.shortcut_mode:
-            return self.key_mappings.get(key_id, {}).get('color', '#4a90e2')
+    def get_button_color(self, key_id, layer):
+        if layer != 'NUM':
+            return self.layer_mappings[layer].get(key_id, {}).get('color', '#4a90e2')
         else:
             if key_id == 'return':
                 return '#44aa44'
             elif key_id in ['backspace', 'delete']:
                 return '#ff8800'
+            elif key_id == 'count':
+                return DEFAULT_COUNT_KEY['color']
             return '#4a90e2'
     
+    def get_button_repeat(self, key_id, layer):
+        """Whether holding the button repeats its key"""
+        mapping = self.layer_mappings[layer].get(key_id, {})
+        if 'layer' in mapping or self.get_button_count(key_id, layer):
+            return False
+        if 'repeat' in mapping:
+            return mapping['repeat']
+        return self.get_button_key(key_id, layer) in self.settings['repeat_keys']
+    
+    def get_button_action(self, key_id, layer):
+        """Return the Inkscape action a key runs, or None to only send keys"""
+        return self.layer_mappings[layer].get(key_id, {}).get('action')
+    
+    def get_button_count(self, key_id, layer):
+        """Whether the key toggles count mode"""
+        if layer == 'NUM':
+            return key_id == 'count'
+        return self.layer_mappings[layer].get(key_id, {}).get('count', False)
+    
+    def get_button_layer(self, key_id, layer):
+        """Return the layer a layer key switches to, or None for normal keys"""
+        return self.layer_mappings[layer].get(key_id, {}).get('layer')
+    
     def init_ui(self):
+        # Parse the stylesheet once for every color the config uses
+        register_colors(mapping.get('color', '#4a90e2')
+                        for mappings in self.layer_mappings.values()
+                        for mapping in mappings.values())
+        
         self.main_layout = QVBoxLayout()
         self.main_layout.setSpacing(5)
         self.main_layout.setContentsMargins(10, 10, 10, 10)
         
         self.title = QLabel("Numpad Palette")
         self.title.setAlignment(Qt.AlignCenter)
-        self.title.setStyleSheet("color: white; font-weight: bold; font-size: 12px;")
         self.title.setCursor(Qt.PointingHandCursor)
         self.main_layout.addWidget(self.title)
         
@@ -213,100 +475,12 @@ class NumpadPalette(QWidget):
         self.buttons_layout.setSpacing(5)
         self.buttons_layout.setContentsMargins(0, 0, 0, 0)
         
-        numpad_layout = QGridLayout()
-        numpad_layout.setSpacing(10)
-        
-        self.btn_7 = self.create_button(
-            self.get_button_label('7'),
-            lambda: self.send_key_to_inkscape(self.get_button_key('7')),
-            color=self.get_button_color('7')
-        )
-        numpad_layout.addWidget(self.btn_7, 0, 0)
-        
-        self.btn_8 = self.create_button(
-            self.get_button_label('8'),
-            lambda: self.send_key_to_inkscape(self.get_button_key('8')),
-            color=self.get_button_color('8')
-        )
-        numpad_layout.addWidget(self.btn_8, 0, 1)
-        
-        self.btn_9 = self.create_button(
-            self.get_button_label('9'),
-            lambda: self.send_key_to_inkscape(self.get_button_key('9')),
-            color=self.get_button_color('9')
-        )
-        numpad_layout.addWidget(self.btn_9, 0, 2)
-        
-        self.btn_4 = self.create_button(
-            self.get_button_label('4'),
-            lambda: self.send_key_to_inkscape(self.get_button_key('4')),
-            color=self.get_button_color('4')
-        )
-        numpad_layout.addWidget(self.btn_4, 1, 0)
-        
-        self.btn_5 = self.create_button(
-            self.get_button_label('5'),
-            lambda: self.send_key_to_inkscape(self.get_button_key('5')),
-            color=self.get_button_color('5')
-        )
-        numpad_layout.addWidget(self.btn_5, 1, 1)
-        
-        self.btn_6 = self.create_button(
-            self.get_button_label('6'),
-            lambda: self.send_key_to_inkscape(self.get_button_key('6')),
-            color=self.get_button_color('6')
-        )
-        numpad_layout.addWidget(self.btn_6, 1, 2)
-        
-        self.btn_1 = self.create_button(
-            self.get_button_label('1'),
-            lambda: self.send_key_to_inkscape(self.get_button_key('1')),
-            color=self.get_button_color('1')
-        )
-        numpad_layout.addWidget(self.btn_1, 2, 0)
-        
-        self.btn_2 = self.create_button(
-            self.get_button_label('2'),
-            lambda: self.send_key_to_inkscape(self.get_button_key('2')),
-            color=self.get_button_color('2')
-        )
-        numpad_layout.addWidget(self.btn_2, 2, 1)
-        
-        self.btn_3 = self.create_button(
-            self.get_button_label('3'),
-            lambda: self.send_key_to_inkscape(self.get_button_key('3')),
-            color=self.get_button_color('3')
-        )
-        numpad_layout.addWidget(self.btn_3, 2, 2)
-        
-        self.btn_0 = self.create_button(
-            self.get_button_label('0'),
-            lambda: self.send_key_to_inkscape(self.get_button_key('0')),
-            color=self.get_button_color('0')
-        )
-        numpad_layout.addWidget(self.btn_0, 3, 0)
-        
-        self.btn_return = self.create_button(
-            self.get_button_label('return'),
-            lambda: self.send_key_to_inkscape(self.get_button_key('return')),
-            color=self.get_button_color('return'),
-            size=(100, 40)
-        )
-        numpad_layout.addWidget(self.btn_return, 3, 1, 1, 2)
-        
-        self.btn_backspace = self.create_button(
-            self.get_button_label('backspace'),
-            lambda: self.send_key_to_inkscape(self.get_button_key('backspace')),
-            color=self.get_button_color('backspace')
-        )
-        numpad_layout.addWidget(self.btn_backspace, 4, 0)
-        
-        self.btn_delete = self.create_button(
-            self.get_button_label('delete'),
-            lambda: self.send_key_to_inkscape(self.get_button_key('delete')),
-            color=self.get_button_color('delete')
-        )
-        numpad_layout.addWidget(self.btn_delete, 4, 1)
+        self.layer_stack = QStackedWidget()
+        self.layer_pages = []
+        self.layer_buttons = {}
+        self.button_pool = []
+        self.layout_spec = None
+        self.build_layer_pages()
         
         control_layout = QHBoxLayout()
         control_layout.setSpacing(5)
@@ -327,40 +501,112 @@ class NumpadPalette(QWidget):
         control_layout.addStretch()
         control_layout.addWidget(close_btn)
         
-        self.buttons_layout.addLayout(numpad_layout)
+        self.buttons_layout.addWidget(self.layer_stack)
         self.buttons_layout.addLayout(control_layout)
         
         self.main_layout.addWidget(self.buttons_container)
         self.setLayout(self.main_layout)
     
-    def recreate_ui(self):
-        self.hide()
-        if self.layout():
-            QWidget().setLayout(self.layout())
-        for child in self.findChildren(QWidget):
-            child.setParent(None)
-        self.init_ui()
-        self.show()
+    def build_layer_pages(self):
+        """Build one page of key buttons per layer from the config's layout block.
+        
+        Every layer is laid out once into its own QStackedWidget page, so a
+        layer switch is a single index change. Buttons are taken from a pool
+        and returned to it on rebuild, so a layout change reuses the
+        existing QPushButtons.
+        """
+        spec = self.key_mappings.get('layout', DEFAULT_LAYOUT)
+        self.layout_spec = spec
+        
+        for buttons in self.layer_buttons.values():
+            for button in buttons.values():
+                button.hide()
+                button.setParent(self.buttons_container)
+                self.button_pool.append(button)
+        for page in self.layer_pages:
+            self.layer_stack.removeWidget(page)
+            page.deleteLater()
+        self.layer_pages = []
+        self.layer_buttons = {}
+        
+        spacing = spec['spacing']
+        default_size = spec['button_size']
+        columns = rows = 0
+        for layer in self.layer_names:
+            page = QWidget()
+            grid = QGridLayout(page)
+            grid.setSpacing(spacing)
+            grid.setContentsMargins(0, 0, 0, 0)
+            buttons = {}
+            for entry in spec['buttons']:
+                if self.button_pool:
+                    button = self.button_pool.pop()
+                else:
+                    button = self.create_button("", self.key_button_clicked)
+                    button.pressed.connect(self.key_button_pressed)
+                size = entry.get('size', default_size)
+                button.setFixedSize(size[0], size[1])
+                button.setProperty('keyId', entry['id'])
+                button.setProperty('layer', layer)
+                row_span = entry.get('row_span', 1)
+                column_span = entry.get('column_span', 1)
+                grid.addWidget(button, entry['row'], entry['column'], row_span, column_span)
+                button.show()
+                buttons[entry['id']] = button
+                rows = max(rows, entry['row'] + row_span)
+                columns = max(columns, entry['column'] + column_span)
+            self.layer_stack.addWidget(page)
+            self.layer_pages.append(page)
+            self.layer_buttons[layer] = buttons
+        
+        self.update_all_buttons()
+        if self.current_layer not in self.layer_names:
+            self.current_layer = 'NUM'
+        self.set_layer(self.current_layer)
+        
+        # Panel size follows the grid: 10px margins, title and control row
+        self.normal_width = columns * default_size[0] + (columns - 1) * spacing + 20
+        self.normal_height = rows * default_size[1] + (rows - 1) * spacing + 40
+        if self.layout() and not self.collapsed:
+            self.setFixedSize(self.normal_width, self.normal_height)
+    
+    def key_button_clicked(self):
+        key_id = self.sender().property('keyId')
+        layer = self.sender().property('layer')
+        if self.get_button_count(key_id, layer):
+            self.toggle_count_mode()
+        elif self.count_mode and layer == 'NUM' and key_id.isdigit():
+            self.add_count_digit(key_id)
+        elif self.get_button_layer(key_id, layer) is None:
+            self.send_key_to_inkscape(self.get_button_key(key_id, layer),
+                                      repeat=self.sender().isDown(),
+                                      action=self.get_button_action(key_id, layer),
+                                      count=self.take_count())
+    
+    def key_button_pressed(self):
+        key_id = self.sender().property('keyId')
+        target = self.get_button_layer(key_id, self.sender().property('layer'))
+        if target is None or target not in self.layer_names:
+            return
+        # A tap latches the layer; holding it returns on release
+        self.hold_return_layer = self.current_layer
+        self.hold_started = time.monotonic()
+        QApplication.instance().installEventFilter(self)
+        self.set_layer(target)
+    
+    def eventFilter(self, watched, event):
+        # The layer key's page is hidden by the switch, so its release is
+        # caught application-wide
+        if event.type() in (QEvent.MouseButtonRelease, QEvent.TabletRelease, QEvent.TouchEnd):
+            QApplication.instance().removeEventFilter(self)
+            if time.monotonic() - self.hold_started >= 0.3:
+                self.set_layer(self.hold_return_layer)
+        return False
     
     def create_button(self, text, callback, color="#4a90e2", size=(45, 40)):
         btn = QPushButton(text)
         btn.setFixedSize(size[0], size[1])
-        btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {color};
-                color: white;
-                border: 1px solid #333;
-                border-radius: 5px;
-                font-size: 10px;
-                font-weight: bold;
-            }}
-            QPushButton:hover {{
-                background-color: {self.lighten_color(color)};
-            }}
-            QPushButton:pressed {{
-                background-color: {self.darken_color(color)};
-            }}
-        """)
+        set_button_color(btn, color)
         btn.clicked.connect(callback)
         btn.setFocusPolicy(Qt.NoFocus)
         return btn
@@ -368,185 +614,171 @@ class NumpadPalette(QWidget):
     def create_toggle_button(self, text, callback, color="#4a90e2", size=(50, 30)):
         btn = QPushButton(text)
         btn.setFixedSize(size[0], size[1])
-        btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {color};
-                color: white;
-                border: 1px solid #333;
-                border-radius: 5px;
-                font-size: 9px;
-                font-weight: bold;
-            }}
-            QPushButton:hover {{
-                background-color: {self.lighten_color(color)};
-            }}
-            QPushButton:pressed {{
-                background-color: {self.darken_color(color)};
-            }}
-        """)
+        set_button_color(btn, color, compact=True)
         btn.clicked.connect(callback)
         btn.setFocusPolicy(Qt.NoFocus)
         return btn
     
+    # === COUNT MODE ===
+    def toggle_count_mode(self):
+        self.count_mode = not self.count_mode
+        self.pending_count = ''
+        self.update_count_buttons()
+        print(f"Count mode {'ON' if self.count_mode else 'OFF'}")
+    
+    def add_count_digit(self, digit):
+        if len(self.pending_count) < MAX_COUNT_DIGITS:
+            self.pending_count += digit
+            self.update_count_buttons()
+    
+    def take_count(self):
+        """Return the pending count (1 if none) and start a new one"""
+        if not self.pending_count:
+            return 1
+        count = max(1, int(self.pending_count))
+        self.pending_count = ''
+        self.update_count_buttons()
+        return count
+    
+    def update_count_buttons(self):
+        for layer, buttons in self.layer_buttons.items():
+            self.update_buttons(layer, [key_id for key_id in buttons
+                                        if self.get_button_count(key_id, layer)])
+    
     def toggle_mode(self):
-        self.shortcut_mode = not self.shortcut_mode
-        self.update_mode_button_style()
-        self.update_all_buttons()
-        mode_text = "shortcut" if self.shortcut_mode else "numpad"
-        print(f"Mode switched to: {mode_text}")
+        index = self.layer_names.index(self.current_layer)
+        self.set_layer(self.layer_names[(index + 1) % len(self.layer_names)])
+        print(f"Layer switched to: {self.current_layer}")
+    
+    def set_layer(self, layer):
+        self.current_layer = layer
+        self.layer_stack.setCurrentIndex(self.layer_names.index(layer))
+        if hasattr(self, 'mode_btn'):
+            self.update_mode_button_style()
     
     def update_mode_button_style(self):
-        if self.shortcut_mode:
-            self.mode_btn.setText("SC")
-            self.mode_btn.setStyleSheet("""
-                QPushButton {
-                    background-color: #ff8800;
-                    color: white;
-                    border: 2px solid #ffaa00;
-                    border-radius: 5px;
-                    font-size: 9px;
-                    font-weight: bold;
-                }
-                QPushButton:hover {
-                    background-color: #ffaa00;
-                }
-            """)
-        else:
-            self.mode_btn.setText("NUM")
-            self.mode_btn.setStyleSheet("""
-                QPushButton {
-                    background-color: #4a90e2;
-                    color: white;
-                    border: 1px solid #333;
-                    border-radius: 5px;
-                    font-size: 9px;
-                    font-weight: bold;
-                }
-                QPushButton:hover {
-                    background-color: #5ba0f2;
-                }
-                QPushButton:pressed {
-                    background-color: #3a80d2;
-                }
-            """)
+        self.mode_btn.setText(self.current_layer[:5])
+        set_button_active(self.mode_btn, self.current_layer != 'NUM')
     
     def update_all_buttons(self):
-        buttons = {
-            '7': self.btn_7, '8': self.btn_8, '9': self.btn_9,
-            '4': self.btn_4, '5': self.btn_5, '6': self.btn_6,
-            '1': self.btn_1, '2': self.btn_2, '3': self.btn_3,
-            '0': self.btn_0, 'return': self.btn_return,
-            'backspace': self.btn_backspace, 'delete': self.btn_delete
-        }
-        
-        for key_id, button in buttons.items():
-            button.setText(self.get_button_label(key_id))
-            color = self.get_button_color(key_id)
-            
-            button.setStyleSheet(f"""
-                QPushButton {{
-                    background-color: {color};
-                    color: white;
-                    border: 1px solid #333;
-                    border-radius: 5px;
-                    font-size: 10px;
-                    font-weight: bold;
-                }}
-                QPushButton:hover {{
-                    background-color: {self.lighten_color(color)};
-                }}
-                QPushButton:pressed {{
-                    background-color: {self.darken_color(color)};
-                }}
-            """)
-    
-    def lighten_color(self, color):
-        color_map = {
-            "#4a90e2": "#5ba0f2", "#ff4444": "#ff6666", "#44aa44": "#66cc66",
-            "#4aa444": "#6cc466", "#ff8800": "#ffaa00", "#888888": "#aaaaaa"
-        }
-        return color_map.get(color, color)
-        
-    def darken_color(self, color):
-        color_map = {
-            "#4a90e2": "#3a80d2", "#ff4444": "#dd2222", "#44aa44": "#228822",
-            "#4aa444": "#2a8a24", "#ff8800": "#cc6600", "#888888": "#666666"
-        }
-        return color_map.get(color, color)
+        for layer, buttons in self.layer_buttons.items():
+            self.update_buttons(layer, buttons)
+    
+    def update_buttons(self, layer, key_ids):
+        buttons = self.layer_buttons[layer]
+        for key_id in key_ids:
+            button = buttons[key_id]
+            button.setText(self.get_button_label(key_id, layer))
+            set_button_color(button, self.get_button_color(key_id, layer))
+            self.set_auto_repeat(button, self.get_button_repeat(key_id, layer))
+            # Pooled buttons may still be lit from an earlier ×N key
+            set_button_active(button, bool(self.get_button_count(key_id, layer)) and
+                              self.count_mode)
+    
+    def set_auto_repeat(self, button, enabled):
+        # Held buttons re-emit clicked at the configured delay and rate
+        button.setAutoRepeat(enabled)
+        button.setAutoRepeatDelay(int(self.settings['repeat_delay'] * 1000))
+        button.setAutoRepeatInterval(max(1, int(1000 / self.settings['repeat_rate'])))
     
     def setup_window(self):
         self.setWindowTitle("Numpad Palette")
         self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint | Qt.Tool)
-        self.setAttribute(Qt.WA_TranslucentBackground)
         self.setFocusPolicy(Qt.NoFocus)
+        # Coming back with Inkscape must not take the focus away from it
+        self.setAttribute(Qt.WA_ShowWithoutActivating)
         
-        self.setStyleSheet("""
-            QWidget {
-                background-color: rgba(0, 0, 0, 120);
-                border-radius: 10px;
-            }
-        """)
+        style_panel(self, self.title, self.settings['render_mode'])
+        self.drag_mover = DragMover(self)
         
-        self.setFixedSize(175, self.normal_height)
+        self.setFixedSize(self.normal_width, self.normal_height)
         
         screen = QApplication.desktop().screenGeometry()
-        self.move(screen.width() - self.width() - 50, 50)
+        self.move(screen.width() - self.width() - self.right_margin(), 50)
     
-    def send_key_to_inkscape(self, key_combination):
-        try:
-            if not isinstance(key_combination, str):
-                print(f"Invalid key combination type: {type(key_combination)}")
-                return
-                
-            if not self.inkscape_window_id:
-                self.find_inkscape_window()
-                
-            if self.inkscape_window_id:
-                subprocess.run(['wmctrl', '-i', '-a', self.inkscape_window_id], 
-                             capture_output=True)
-                time.sleep(0.05)
-            else:
-                subprocess.run(['xdotool', 'windowactivate', '--sync', 
-                              '$(xdotool search --class inkscape | head -1)'], 
-                              shell=True, capture_output=True)
-                time.sleep(0.05)
+    def send_key_to_inkscape(self, key_combination, repeat=False, action=None, count=1):
+        # A key string, or a list of steps for a macro; None for an action alone
+        if not isinstance(key_combination, (str, list)) and not action:
+            print(f"Invalid key combination type: {type(key_combination)}")
+            return
             
-            final_key = str(key_combination)
-                
-            if '+' in final_key:
-                keys = final_key.replace('ctrl', 'control')
-                subprocess.run(['xdotool', 'key', keys], capture_output=True)
+        trace = PressTrace(action or key_combination)
+        if not self.inkscape_window_id and not self.window_tracker:
+            self.find_inkscape_window()
+        trace.mark('lookup')
+        
+        if self.host:
+            # SHIFT/CTRL toggled on the floating keypad apply here too
+            key_combination, action = self.host.modify_press(key_combination, action)
+        
+        # Delivery runs on the dispatch thread so the palette never blocks;
+        # repeats of a held key merge into one burst while delivery lags, and
+        # a counted press goes out as one batch with a single activation
+        self.dispatcher.submit(key_combination, self.inkscape_window_id, action, merge=repeat,
+                               trace=trace, count=count)
+    
+    def deliver_key(self, final_key, window_id, action=None, count=1, trace=None):
+        # A macro is delivered like a single key: one activation, one injection
+        if action:
+            # An Inkscape action needs no focus; its keys are the fallback
+            try:
+                backend = self.injector.send_action(action, count=count)
+                self.record_press(trace, backend)
+                print(f"Ran action: {action} x{count} via {backend}")
+                return
+            except ValueError as e:
+                print(f"Action {action} not run, sending keys: {e}")
+            if final_key is None:
+                return
+        
+        try:
+            if self.injector.targets_inkscape:
+                # The compositor finds and focuses Inkscape itself
+                backend = self.injector.send(final_key, count=count)
+            elif window_id and self.injector.focus_mode == 'direct':
+                backend = self.injector.send_to_window(final_key, window_id, count=count)
             else:
-                subprocess.run(['xdotool', 'key', final_key], capture_output=True)
+                # Raises if no Inkscape window could be raised
+                self.injector.activate_window(window_id, trace)
+                backend = self.injector.send(final_key, count=count)
                 
-            mode_text = "shortcut" if self.shortcut_mode else "numpad"
-            print(f"Sent key: {final_key} ({mode_text} mode)")
+            self.record_press(trace, backend)
+            print(f"Sent key: {format_keys(final_key)} x{count} via {backend} "
+                  f"({self.current_layer} layer)")
             
         except Exception as e:
             print(f"Key send error: {e}")
-            
-            try:
-                if not isinstance(key_combination, str):
-                    print(f"Fallback: Invalid key combination type: {type(key_combination)}")
-                    return
-                    
-                final_key = str(key_combination)
-                
-                if '+' in final_key:
-                    pyautogui.hotkey(*final_key.split('+'))
-                else:
-                    pyautogui.press(final_key.lower())
-                        
-                mode_text = "shortcut" if self.shortcut_mode else "numpad"
-                print(f"Fallback sent key: {final_key} ({mode_text} mode)")
-                        
-            except Exception as fallback_error:
-                print(f"Fallback error: {fallback_error}")
+    
+    def record_press(self, trace, backend):
+        if trace:
+            trace.mark('inject')
+            trace.backend = backend
+            self.latency.record(trace)
+            self.latency_recorded.emit()
+    
+    def handle_instance_command(self, command):
+        if command == 'show':
+            self.show()
+            self.raise_()
+            return 'ok'
+        if command == 'quit':
+            QTimer.singleShot(0, self.close_application)
+            return 'ok'
+        return 'unknown'
     
     def close_application(self):
+        if self.host:
+            self.host.close_application()
+            return
         print("Quitting application...")
         if hasattr(self, 'tray_icon'):
             self.tray_icon.hide()
+        self.dispatcher.stop()
+        self.injector.close()
+        if self.window_tracker:
+            self.window_tracker.close()
+        if self.instance_server:
+            self.instance_server.close()
         self.hide()
         QApplication.quit()
         os._exit(0)
@@ -579,20 +811,114 @@ class NumpadPalette(QWidget):
             
     def mouseMoveEvent(self, event):
         if hasattr(self, 'drag_start') and event.buttons() == Qt.LeftButton:
-            self.move(event.globalPos() - self.drag_start)
+            # Pointer events can outpace the display; move once per frame
+            self.drag_mover.move(event.globalPos() - self.drag_start)
+    
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.drag_mover.finish()
+
+def validate_config(data):
+    """Check a parsed numpad_config.yaml and normalize its entries"""
+    if not isinstance(data, dict):
+        raise ValueError("config must be a mapping of key ids to key settings")
+    
+    mappings = validate_entries({key_id: mapping for key_id, mapping in data.items()
+                                 if str(key_id) not in CONFIG_SECTIONS})
+    if isinstance(data.get('settings'), dict):
+        mappings['settings'] = data['settings']
+    if 'layout' in data:
+        try:
+            mappings['layout'] = validate_layout(data['layout'])
+        except (TypeError, ValueError, KeyError, IndexError, AttributeError) as e:
+            print(f"Ignoring invalid layout: {e}")
+    if isinstance(data.get('layers'), dict):
+        mappings['layers'] = {}
+        for name, entries in data['layers'].items():
+            name = str(name)
+            if name in ('NUM', 'SC') or not isinstance(entries, dict):
+                print(f"Ignoring invalid layer: {name}")
+                continue
+            mappings['layers'][name] = validate_entries(entries)
+    return mappings
+
+def validate_entries(entries):
+    mappings = {}
+    for key_id, mapping in entries.items():
+        key_id = str(key_id)
+        if not isinstance(mapping, dict) or not ('key' in mapping or 'keys' in mapping or
+                                                 'layer' in mapping or 'action' in mapping or
+                                                 'count' in mapping):
+            print(f"Ignoring invalid config entry: {key_id}")
+            continue
+        mapping = dict(mapping)
+        if 'key' in mapping:
+            mapping['key'] = str(mapping['key'])
+        if 'keys' in mapping:
+            try:
+                mapping['keys'] = validate_steps(mapping['keys'])
+            except (TypeError, ValueError, KeyError) as e:
+                print(f"Ignoring invalid keys of {key_id}: {e}")
+                continue
+        if 'layer' in mapping:
+            mapping['layer'] = str(mapping['layer'])
+        if 'action' in mapping:
+            mapping['action'] = str(mapping['action'])
+        if 'repeat' in mapping:
+            mapping['repeat'] = bool(mapping['repeat'])
+        if 'count' in mapping:
+            mapping['count'] = bool(mapping['count'])
+        mapping['label'] = str(mapping.get('label', key_id))
+        mapping['color'] = str(mapping.get('color', '#4a90e2'))
+        mappings[key_id] = mapping
+    return mappings
+
+def validate_steps(steps):
+    """Normalize a macro: key strings, or {key, delay} for a pause before a step"""
+    if not isinstance(steps, list) or not steps:
+        raise ValueError("keys must be a non-empty list")
+    validated = []
+    for step in steps:
+        if isinstance(step, dict):
+            delay = float(step.get('delay', 0))
+            if delay < 0:
+                raise ValueError("delay must not be negative")
+            validated.append({'key': str(step['key']), 'delay': delay})
+        else:
+            validated.append(str(step))
+    return validated
+
+def validate_layout(spec):
+    """Normalize a layout block; every button needs an id, row and column"""
+    button_size = [int(v) for v in spec.get('button_size', DEFAULT_LAYOUT['button_size'])[:2]]
+    layout = {
+        'button_size': button_size,
+        'spacing': int(spec.get('spacing', DEFAULT_LAYOUT['spacing'])),
+        'buttons': [],
+    }
+    
+    taken = set()
+    for entry in spec['buttons']:
+        button = {
+            'id': str(entry['id']),
+            'row': int(entry['row']),
+            'column': int(entry['column']),
+            'row_span': int(entry.get('row_span', 1)),
+            'column_span': int(entry.get('column_span', 1)),
+        }
+        if 'size' in entry:
+            button['size'] = [int(v) for v in entry['size'][:2]]
+        if button['id'] in taken:
+            raise ValueError(f"duplicate button id {button['id']}")
+        taken.add(button['id'])
+        layout['buttons'].append(button)
+    if not layout['buttons']:
+        raise ValueError("layout has no buttons")
+    return layout
 
 def check_dependencies():
-    missing_tools = []
-    
-    try:
-        subprocess.run(['wmctrl', '--version'], capture_output=True, check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        missing_tools.append('wmctrl')
-        
-    try:
-        subprocess.run(['xdotool', '--version'], capture_output=True, check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        missing_tools.append('xdotool')
+    tools = probe_tools(['wmctrl', 'xdotool'])
+    missing_tools = [tool for tool, available in tools.items() if not available]
         
     if missing_tools:
         print("Please install the following tools:")
@@ -601,24 +927,34 @@ def check_dependencies():
         print()
 
 def main():
+    profile = StartupProfile(STARTUP_TIME, '--startup-profile' in sys.argv)
+    profile.mark('imports')
+    
+    if send_command('numpad_palette', 'show'):
+        print("Numpad Palette is already running")
+        return
+    
     check_dependencies()
+    profile.mark('dependency check')
     
     app = QApplication.instance()
     if app is None:
         app = QApplication(sys.argv)
-    
-    pyautogui.FAILSAFE = True
-    pyautogui.PAUSE = 0.05
+    # Sets WM_CLASS, so other keypad processes can tell this one's windows apart
+    app.setApplicationName('numpad_palette')
+    profile.mark('QApplication')
     
     app.setQuitOnLastWindowClosed(False)
     
-    palette = NumpadPalette()
+    palette = NumpadPalette(profile)
     palette.show()
+    profile.mark('show')
     
     print("Numpad Palette started")
     print("Usage:")
-    print("- NUM: Numpad mode (direct number input)")
-    print("- SC: Shortcut mode (YAML configured keys)")
+    print("- NUM: Numpad layer (direct number input)")
+    print("- SC and named layers: shortcut layers (YAML configured keys)")
+    print("- Mode button cycles layers; 'layer:' keys switch while held")
     print("- Configure shortcuts in numpad_config.yaml")
     print("- ↻ button to refresh Inkscape window")
     print("- ⟲ button to reload configuration")
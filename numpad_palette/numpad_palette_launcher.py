@@ -4,12 +4,17 @@
 import inkex
 import os
 import sys
+from keypad_instance import send_command
 
 class NumpadPaletteLauncher(inkex.EffectExtension):
     def effect(self):
         ext_dir = os.path.dirname(os.path.abspath(__file__))
         palette_script = os.path.join(ext_dir, "numpad_palette.py")
         
+        # Re-opening raises the running palette instead of starting another one
+        if send_command('numpad_palette', 'show'):
+            return
+        
         if not os.path.exists(palette_script):
             return
         